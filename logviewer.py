@@ -1,35 +1,133 @@
+import time
+
+# Начало запуска - от него считается время до первого окна
+STARTUP_BEGIN = time.perf_counter()
+
 import os
 import json
 import glob
 import serial
 import re
-import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox,Menu, filedialog
+import sys
+import csv
+import argparse
 import threading
+import gc
+import atexit
+import bisect
+import contextlib
+import functools
 import queue
-import time
-from datetime import datetime, timezone
-from collections import defaultdict
-from meshtastic.serial_interface import SerialInterface
-from meshtastic.tcp_interface import TCPInterface
+import random
+from datetime import datetime, timedelta, timezone
+from collections import defaultdict, deque
+
+
+def import_tk():
+    """
+    Импортирует Tkinter. Вызывается только при создании GUI,
+    чтобы пакетный режим работал без Tk
+    """
+    global tk, ttk, scrolledtext, messagebox, Menu, filedialog
+    import tkinter as tk
+    from tkinter import ttk, scrolledtext, messagebox, Menu, filedialog
+
+
+@functools.lru_cache(maxsize=4096)
+def time_to_seconds(timestamp):
+    """
+    Переводит "HH:MM:SS" в секунды от начала суток, None если время некорректно.
+    Кэшируется: метрики и задержки ретрансляции переводят одни и те же секунды лога
+    """
+    try:
+        hours, minutes, seconds = timestamp.split()[0].split(':')
+        hours, minutes, seconds = int(hours), int(minutes), int(seconds)
+    except (ValueError, AttributeError, IndexError):
+        return None
+    if not (0 <= hours < 24 and 0 <= minutes < 60 and 0 <= seconds < 60):
+        return None
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def time_difference(start, end):
+    """Секунды от start до end (оба "HH:MM:SS") с переходом через полночь"""
+    t1 = time_to_seconds(start)
+    t2 = time_to_seconds(end)
+    if t1 is None or t2 is None:
+        return None
+    return (t2 - t1) % 86400
+
+
+class LocalTimeConverter:
+    """
+    Переводит время "HH:MM:SS" из UTC в местное.
+    Смещение часового пояса считается раз в сутки, само преобразование - целочисленное
+    """
+    def __init__(self, cache_size=4096):
+        self.day = None
+        self.day_end = 0  # Местная полночь следующих суток (epoch)
+        self.offset = None  # Смещение в секундах, None - меняется в течение суток
+        self.convert_cached = functools.lru_cache(maxsize=cache_size)(self._convert)
+
+    def refresh(self):
+        """Пересчитывает смещение для текущих суток"""
+        self.day = datetime.now().date()
+        day_start = datetime.combine(self.day, datetime.min.time(), tzinfo=timezone.utc)
+        first_offset = day_start.astimezone().utcoffset()
+        last_offset = (day_start + timedelta(seconds=86399)).astimezone().utcoffset()
+        # В день перехода на летнее/зимнее время считаем каждую секунду точно
+        self.offset = int(first_offset.total_seconds()) if first_offset == last_offset else None
+        self.day_end = datetime.combine(self.day + timedelta(days=1), datetime.min.time()).timestamp()
+        self.convert_cached.cache_clear()
+
+    def convert(self, timestamp):
+        if time.time() >= self.day_end:
+            self.refresh()
+        return self.convert_cached(timestamp)
+
+    def context(self):
+        """От чего зависит результат convert: смещение, а в день перехода на летнее/зимнее время - дата"""
+        if time.time() >= self.day_end:
+            self.refresh()
+        return self.offset if self.offset is not None else self.day.isoformat()
+
+    def _convert(self, timestamp):
+        seconds = time_to_seconds(timestamp)
+        if seconds is None:
+            raise ValueError(f"Некорректное время: {timestamp}")
+        if self.offset is None:
+            utc_date = datetime.combine(self.day, datetime.min.time(), tzinfo=timezone.utc)
+            utc_date += timedelta(seconds=seconds)
+            return utc_date.astimezone().strftime("%H:%M:%S")
+        seconds = (seconds + self.offset) % 86400
+        return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+local_time_converter = LocalTimeConverter()
 
 
 def convert_with_local_offset(timestamp):
     """
-    Преобразует дату с учетом локального часового пояса
+    Преобразует время UTC в местное с учетом часового пояса на текущую дату
     """
-    today = datetime.now().date()
+    return local_time_converter.convert(timestamp)
 
-    input_date = datetime.strptime(str(today.year)+" "+timestamp, "%Y %H:%M:%S")
-    # Предполагаем, что входная дата в UTC
-    utc_date = input_date.replace(tzinfo=timezone.utc)
-    
-    # Конвертируем в локальный часовой пояс
-    local_date = utc_date.astimezone()
 
-    out_timestamp= local_date.strftime("%H:%M:%S")
-    
-    return out_timestamp
+@contextlib.contextmanager
+def gc_paused():
+    """
+    Выключает циклический сборщик мусора на время массового разбора или загрузки.
+    LogEvent со слотами, в отличие от словаря из строк и чисел, сборщик отслеживает
+    всегда и на миллионах событий обходит их снова и снова; циклов события не образуют
+    и освобождаются подсчетом ссылок
+    """
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_enabled:
+            gc.enable()
 
 def load_relayinfo(filename):
     relayinfo = {}
@@ -60,21 +158,430 @@ def load_relayinfo(filename):
     return relayinfo
 
 
+NODEINFO_FILE = 'nodeinfo.json'
+
+
+def load_nodeinfo(filename=NODEINFO_FILE):
+    """Читает сохраненный nodeinfo, {} если файла нет или он испорчен"""
+    if not os.path.exists(filename):
+        return {}
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Ошибка чтения {filename}: {e}")
+        return {}
+
+
+def save_nodeinfo(nodeinfo, filename=NODEINFO_FILE):
+    """Записывает nodeinfo атомарно: во временный файл, затем замена"""
+    temp_filename = filename + '.tmp'
+    with open(temp_filename, 'w', encoding='utf-8') as f:
+        json.dump(nodeinfo, f, ensure_ascii=False, indent=2)
+    os.replace(temp_filename, filename)
+
+
+def merge_nodeinfo(nodeinfo, nodes):
+    """
+    Вливает узлы, полученные с ноды, в nodeinfo на месте.
+    Возвращает (изменившиеся узлы, узлы с новыми или измененными именами) - ID без '!'
+    """
+    changed = []
+    renamed = []
+    for key, info in nodes.items():
+        old = nodeinfo.get(key)
+        if old == info:
+            continue
+        nodeinfo[key] = info
+        node_id = key.lstrip('!')
+        changed.append(node_id)
+        old_user = old.get('user', {}) if old else {}
+        user = info.get('user', {})
+        if (old is None or old_user.get('longName') != user.get('longName') or
+                old_user.get('shortName') != user.get('shortName')):
+            renamed.append(node_id)
+    return changed, renamed
+
+
+class NodeinfoFetcher:
+    """
+    Загружает базу узлов с ноды (последовательный порт или TCP) в фоновом потоке.
+    GUI опрашивает get_progress()/finished, результат - nodes, ошибка - error
+    """
+
+    def __init__(self, dev_path=None, hostname=None, port=4403):
+        self.dev_path = dev_path
+        self.hostname = hostname
+        self.port = port
+        self.nodes = None
+        self.error = None
+        self.stage = "ожидание"
+        self.nodes_received = 0
+        self.started = None
+        self.finished = False
+        self.thread = None
+
+    @property
+    def name(self):
+        if self.hostname:
+            return f"{self.hostname}:{self.port}"
+        return self.dev_path
+
+    def start(self):
+        self.started = time.time()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def on_node_updated(self, node, interface):
+        """Узел пришел при загрузке базы - для прогресса"""
+        self.nodes_received += 1
+
+    def run(self):
+        try:
+            # meshtastic тянет protobuf и пр. - импортируем только когда нужен
+            self.stage = "импорт meshtastic"
+            if self.hostname:
+                from meshtastic.tcp_interface import TCPInterface
+            else:
+                from meshtastic.serial_interface import SerialInterface
+            try:
+                from pubsub import pub
+                pub.subscribe(self.on_node_updated, "meshtastic.node.updated")
+            except Exception:
+                pub = None
+
+            self.stage = "загрузка узлов"
+            if self.hostname:
+                iface = TCPInterface(hostname=self.hostname, portNumber=self.port, timeout=3)
+            else:
+                iface = SerialInterface(devPath=self.dev_path)
+            try:
+                self.nodes = dict(iface.nodes or {})
+            finally:
+                iface.close()
+                if pub:
+                    pub.unsubscribe(self.on_node_updated, "meshtastic.node.updated")
+            self.stage = "готово"
+        except Exception as e:
+            self.error = e
+            print(f"Ошибка загрузки nodeinfo с {self.name}: {e}")
+        finally:
+            self.finished = True
+
+    def get_progress(self):
+        return {
+            'stage': self.stage,
+            'nodes': len(self.nodes) if self.nodes is not None else self.nodes_received,
+            'elapsed': time.time() - self.started if self.started else 0
+        }
+
+
+DISPLAY_MODES = ('combine', 'longname', 'shortname', 'id')
+
+# ID узлов в строке маршрута traceroute
+ROUTE_NODE_RE = re.compile(r'0x([a-fA-F0-9]+)')
+
+
+class NodeNames:
+    """
+    Отображаемые имена узлов, посчитанные сразу для всех режимов (Вид -> Имена).
+    Пересчитываются при изменении nodeinfo, смена режима только переключает таблицу.
+    Общие для таблицы пакетов, деталей и расшифровки маршрутов
+    """
+    # Сколько расшифрованных маршрутов держать, дальше кэш начинается заново
+    MAX_ROUTES = 10000
+
+    def __init__(self, nodeinfo=None, mode='combine'):
+        self.by_mode = {display_mode: {} for display_mode in DISPLAY_MODES}
+        self.nodeinfo = nodeinfo or {}
+        self.routes = {}
+        self.set_mode(mode)
+
+    def set_mode(self, mode):
+        self.mode = mode if mode in self.by_mode else 'id'
+        self.names = self.by_mode[self.mode]
+        self.routes = {}
+
+    def update(self, nodeinfo, node_ids=None):
+        """
+        Новый nodeinfo. node_ids - ID узлов без '!', чьи записи изменились;
+        None - пересчитать все
+        """
+        self.nodeinfo = nodeinfo
+        if node_ids is None:
+            for names in self.by_mode.values():
+                names.clear()
+        else:
+            for node_id in node_ids:
+                for names in self.by_mode.values():
+                    names.pop(node_id, None)
+        self.routes = {}
+
+    def add(self, node_id):
+        """Считает имена узла во всех режимах, возвращает имя в текущем"""
+        short_id = node_id[4:]
+        info = self.nodeinfo.get('!' + node_id)
+        if info is None:
+            combine = long_name = short_name = short_id
+        else:
+            user = info.get('user', {})
+            long_name = user.get('longName', short_id)
+            short_name = user.get('shortName', short_id)
+            combine = f"{long_name} ({short_name})"
+        by_mode = self.by_mode
+        by_mode['combine'][node_id] = combine
+        by_mode['longname'][node_id] = long_name
+        by_mode['shortname'][node_id] = short_name
+        by_mode['id'][node_id] = short_id
+        return self.names[node_id]
+
+    def get(self, node_id, mode=None):
+        if node_id is None:
+            return "N/A"
+        names = self.names if mode is None else self.by_mode.get(mode, self.by_mode['id'])
+        name = names.get(node_id)
+        if name is None:
+            self.add(node_id)
+            name = names[node_id]
+        return name
+
+    def route(self, route_str):
+        """Строка маршрута traceroute с именами вместо ID узлов"""
+        result = self.routes.get(route_str)
+        if result is None:
+            if len(self.routes) >= self.MAX_ROUTES:
+                self.routes = {}
+            result = self.routes[route_str] = ROUTE_NODE_RE.sub(
+                lambda match: self.get(match.group(1).zfill(8)), route_str)
+        return result
+
+
 import socket
 import select
+import string
+
+class LogWriter:
+    """
+    Пишет принятые строки в logs/YYYYMMDD.log из отдельного потока.
+    Файл держится открытым, запись пачками, сброс на диск раз в flush_interval
+    секунд или при накоплении flush_size байт
+    """
+    def __init__(self, directory='logs', flush_interval=1.0, flush_size=64 * 1024):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.data_queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.file = None
+        self.filename = None
+        self.day_end = 0  # Местная полночь, после которой начинается новый файл
+        self.pending_bytes = 0
+        self.last_flush = time.time()
+
+    def start(self):
+        """Запускает поток записи (при первой записи)"""
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self._write_loop)
+            self.thread.daemon = True
+            self.thread.start()
+            atexit.register(self.close)
+
+    def write(self, line):
+        """Ставит строку в очередь на запись"""
+        if self.thread is None:
+            self.start()
+        self.data_queue.put(line)
+
+    def write_lines(self, lines):
+        """Ставит пачку строк в очередь на запись"""
+        if self.thread is None:
+            self.start()
+        self.data_queue.put(list(lines))
+
+    def _write_loop(self):
+        running = True
+        while running:
+            try:
+                items = [self.data_queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                items = []
+            # Забираем все, что накопилось, одной пачкой
+            while True:
+                try:
+                    items.append(self.data_queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = []
+            for item in items:
+                if item is None:
+                    running = False
+                elif isinstance(item, list):
+                    lines.extend(item)
+                else:
+                    lines.append(item)
+
+            try:
+                if lines:
+                    self._write_lines(lines)
+                if self.file and (not running or self.pending_bytes >= self.flush_size
+                                  or time.time() - self.last_flush >= self.flush_interval):
+                    self._flush()
+            except Exception as e:
+                print(f"Ошибка записи лога: {e}")
+                time.sleep(0.1)
+
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def _write_lines(self, lines):
+        if time.time() >= self.day_end:
+            self._rotate()
+        data = "\r\n".join(lines) + "\r\n"
+        self.file.write(data)
+        self.pending_bytes += len(data)
+
+    def daily_filename(self, day=None):
+        """Имя файла лога за сутки day (по умолчанию - сегодня)"""
+        day = day or datetime.now()
+        return os.path.join(self.directory, f"{day.strftime('%Y%m%d')}.log")
+
+    def _rotate(self):
+        """Открывает файл за текущие сутки"""
+        today = datetime.now()
+        self.filename = self.daily_filename(today)
+        self.day_end = datetime.combine(today.date() + timedelta(days=1), datetime.min.time()).timestamp()
+        if self.file:
+            self.file.close()
+        os.makedirs(self.directory, exist_ok=True)
+        self.file = open(self.filename, "a", encoding='utf-8', buffering=self.flush_size)
+        self.pending_bytes = 0
+
+    def _flush(self):
+        self.file.flush()
+        self.pending_bytes = 0
+        self.last_flush = time.time()
+
+    def close(self):
+        """Дописывает очередь на диск и останавливает поток"""
+        with self.lock:
+            thread = self.thread
+            self.thread = None
+        if thread is not None:
+            self.data_queue.put(None)
+            thread.join()
+
+
+# Общий для всех источников файл логов
+log_writer = LogWriter()
+
+
+def split_lines(buffer):
+    """
+    Забирает из bytearray все полные строки, возвращает (непустые строки, число
+    забранных байт). Неполная последняя строка остается в буфере
+    """
+    end = buffer.rfind(b'\n')
+    if end < 0:
+        return [], 0
+    text = buffer[:end].decode('utf-8', errors='ignore')
+    del buffer[:end + 1]
+    lines = [line.strip() for line in text.split('\n')]
+    return [line for line in lines if line], end + 1
+
+
+# Формат: <PRI>1 - HOSTNAME MODULE - - - [TIMESTAMP]: MESSAGE
+SYSLOG_PATTERN = re.compile(r'<(\d+)>1\s+-\s+(\S+)\s+(\w+)\s+-\s+-\s+-\s+\[(\d+)\]:\s*(.+)')
+
+
+def parse_syslog_line(line):
+    """
+    Парсит syslog строку и возвращает компоненты
+    Формат: <PRI>VERSION - HOSTNAME MODULE - - - [TIMESTAMP]: MESSAGE
+    """
+    result = {
+        'pri': None,
+        'severity': None,
+        'facility': None,
+        'hostname': None,
+        'module': None,
+        'timestamp': None,
+        'message': None
+    }
+
+
+    # Извлекаем компоненты: hostname, module, timestamp, message
+    # Формат: 1 - HOSTNAME MODULE - - - [TIMESTAMP]: MESSAGE
+    line = line.replace('\ufeff', '')
+    parts_match = SYSLOG_PATTERN.match(line)
+
+    if parts_match:
+        pri = int(parts_match.group(1))
+        result['pri'] = pri
+        result['severity'] = pri & 0x07
+        result['facility'] = pri >> 3
+        result['hostname'] = parts_match.group(2)
+        result['module'] = parts_match.group(3)
+        result['timestamp'] = parts_match.group(4)
+        result['message'] = parts_match.group(5)
+
+    return result
+
+
+def syslog_datagram_lines(datagrams, time1=None):
+    """
+    Переводит пачку UDP датаграмм syslog в строки формата лога узла.
+    Время приема ставится одно на пачку. Возвращает (строки, число некорректных строк)
+    """
+    if time1 is None:
+        time1 = datetime.now().strftime('%H:%M:%S')
+    match = SYSLOG_PATTERN.match
+    lines = []
+    malformed = 0
+    for data in datagrams:
+        text = str(data, 'utf-8', 'ignore')
+        if '\ufeff' in text:
+            text = text.replace('\ufeff', '')
+        for line in text.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            m = match(line)
+            if m:
+                # Модуль в начале сообщения для контекста
+                lines.append(f"{time1} {m[4]} [{m[3]}] {m[5]}")
+            else:
+                malformed += 1
+    return lines, malformed
+
 
 class UDPReceiver:
-    def __init__(self, port=1514):
+    MAX_DATAGRAM = 65535
+
+    def __init__(self, port=1514, buffer_size=1024 * 1024, max_batches=10000):
         self.port = port
         self.sock = None
         self.running = False
-        self.data_queue = queue.Queue()
+        self.data_queue = queue.Queue(maxsize=max_batches)
         self.to_file = True
+        # Все датаграммы за одно пробуждение принимаются подряд в один буфер
+        self.buffer = bytearray(max(buffer_size, self.MAX_DATAGRAM + 1))
+        self.datagrams = 0
+        self.dropped = 0     # Строки, не влезшие в очередь (GUI не успевает разбирать)
+        self.malformed = 0   # Строки не в формате syslog
 
     def start(self):
         """Запускает UDP сервер"""
         try:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                # Запас на всплески, пока поток разбирает пачку
+                self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, len(self.buffer))
+            except OSError:
+                pass
             self.sock.bind(('0.0.0.0', self.port))
             self.sock.setblocking(False)
             self.running = True
@@ -91,63 +598,54 @@ class UDPReceiver:
         Парсит syslog строку и возвращает компоненты
         Формат: <PRI>VERSION - HOSTNAME MODULE - - - [TIMESTAMP]: MESSAGE
         """
-        result = {
-            'pri': None,
-            'severity': None,
-            'facility': None,
-            'hostname': None,
-            'module': None,
-            'timestamp': None,
-            'message': None
-        }
-        
-        
-        # Извлекаем компоненты: hostname, module, timestamp, message
-        # Формат: 1 - HOSTNAME MODULE - - - [TIMESTAMP]: MESSAGE
-        line = line.replace('\ufeff', '')
-        parts_match = re.search(r'^<(\d+)>1\s+-\s+(\S+)\s+(\w+)\s+-\s+-\s+-\s+\[(\d+)\]:\s*(.+)', line)
-
-        if parts_match:
-            pri = int(parts_match.group(1))
-            result['pri'] = pri
-            result['severity'] = pri & 0x07
-            result['facility'] = pri >> 3
-            result['hostname'] = parts_match.group(2)
-            result['module'] = parts_match.group(3)
-            result['timestamp'] = parts_match.group(4)
-            result['message'] = parts_match.group(5)
-        
-        return result
+        return parse_syslog_line(line)
+
+    def _receive_batch(self):
+        """
+        Забирает из сокета все ожидающие датаграммы в буфер, разделяя их переводом строки.
+        Возвращает число занятых байт
+        """
+        view = memoryview(self.buffer)
+        limit = len(self.buffer) - self.MAX_DATAGRAM - 1
+        pos = 0
+        while pos <= limit:
+            try:
+                n = self.sock.recv_into(view[pos:pos + self.MAX_DATAGRAM])
+            except (BlockingIOError, InterruptedError):
+                break
+            view[pos + n] = 10  # b'\n'
+            pos += n + 1
+            self.datagrams += 1
+        return pos
 
     def _read_udp(self):
         """Читает данные из UDP сокета"""
         while self.running:
             try:
                 ready = select.select([self.sock], [], [], 0.1)
-                if ready[0]:
-                    data, addr = self.sock.recvfrom(65535)
-                    try:
-                        decoded_data = data.decode('utf-8', errors='ignore')
-                        lines = decoded_data.split('\n')
-
-                        for line in lines:
-                            line = line.strip()
-                            if line:
-                                # Извлекаем сообщение и модуль
-                                parsed = self.parse_syslog_line(line)
-                                if parsed['message']:
-                                    time1 = datetime.now().strftime('%H:%M:%S')
-                                    timestamp = parsed['timestamp']
-                                    # Можно добавить модуль в начало сообщения для контекста
-                                    converted_line = f"{time1} {timestamp} [{parsed['module']}] {parsed['message']}"
-                                    self.data_queue.put(converted_line)
-                                    if self.to_file:
-                                        todaylogname = f"logs/{datetime.now().strftime('%Y%m%d')}.log"
-                                        with open(todaylogname, "a", encoding='utf-8') as f:
-                                            f.write(converted_line + "\r\n")
-                    except Exception as e:
-                        print(f"Ошибка декодирования UDP данных: {e}")
+                if not ready[0]:
+                    continue
+                size = self._receive_batch()
+                if not size:
+                    continue
+                try:
+                    lines, malformed = syslog_datagram_lines((memoryview(self.buffer)[:size],))
+                except Exception as e:
+                    print(f"Ошибка декодирования UDP данных: {e}")
+                    continue
+                self.malformed += malformed
+                if not lines:
+                    continue
+                # В файл пишется все принятое, отбрасывается только то, что не успевает GUI
+                if self.to_file:
+                    log_writer.write_lines(lines)
+                try:
+                    self.data_queue.put_nowait(lines)
+                except queue.Full:
+                    self.dropped += len(lines)
             except Exception as e:
+                if not self.running:
+                    break
                 print(f"Ошибка чтения UDP: {e}")
                 time.sleep(0.1)
 
@@ -156,11 +654,20 @@ class UDPReceiver:
         data = []
         while not self.data_queue.empty():
             try:
-                data.append(self.data_queue.get_nowait())
+                data.extend(self.data_queue.get_nowait())
             except queue.Empty:
                 break
         return data
 
+    def summary(self):
+        """Счетчики приема для статус бара"""
+        text = f"UDP:{self.port} датаграмм: {self.datagrams}"
+        if self.dropped:
+            text += f", отброшено строк: {self.dropped}"
+        if self.malformed:
+            text += f", некорректных строк: {self.malformed}"
+        return text
+
     def stop(self):
         """Останавливает UDP сервер"""
         self.running = False
@@ -168,13 +675,15 @@ class UDPReceiver:
             self.sock.close()
 
 class SerialReader:
-    def __init__(self, port='/dev/ttyUSB0', baudrate=115200):
+    def __init__(self, port='/dev/ttyUSB0', baudrate=115200, blocking=True, read_timeout=0.5):
         self.port = port
         self.baudrate = baudrate
         self.serial = None
         self.running = False
         self.data_queue = queue.Queue()
         self.to_file = True
+        self.blocking = blocking  # Блокирующее чтение вместо опроса порта раз в 100 мс
+        self.read_timeout = read_timeout
 
     @staticmethod
     def find_serial_ports():
@@ -207,10 +716,11 @@ class SerialReader:
             self.serial = serial.Serial(
                 port=self.port,
                 baudrate=self.baudrate,
-                timeout=5
+                timeout=self.read_timeout if self.blocking else 5
             )
             self.running = True
-            thread = threading.Thread(target=self._read_serial)
+            target = self._read_serial_blocking if self.blocking else self._read_serial
+            thread = threading.Thread(target=target)
             thread.daemon = True
             thread.start()
             return True
@@ -235,11 +745,32 @@ class SerialReader:
                         if line:
                             self.data_queue.put(line)
                             if self.to_file:
-                                todaylogname = f"logs/{datetime.now().strftime('%Y%m%d')}.log"
-                                f = open(todaylogname, "a")
-                                f.write(line+"\r\n")
-                                f.close()
+                                log_writer.write(line)
+            except Exception as e:
+                print(f"Ошибка чтения: {e}")
+                time.sleep(0.1)
+
+    def _read_serial_blocking(self):
+        """
+        Читает порт блокирующим read с таймаутом, все полные строки
+        из накопленного буфера отдает в очередь одной пачкой
+        """
+        buffer = bytearray()
+        while self.running:
+            try:
+                # Ждем хотя бы один байт, затем забираем все, что уже пришло
+                data = self.serial.read(max(1, self.serial.in_waiting))
+                if not data:
+                    continue
+                buffer += data
+                lines, _ = split_lines(buffer)
+                if lines:
+                    self.data_queue.put(lines)
+                    if self.to_file:
+                        log_writer.write_lines(lines)
             except Exception as e:
+                if not self.running:
+                    break
                 print(f"Ошибка чтения: {e}")
                 time.sleep(0.1)
 
@@ -248,9 +779,14 @@ class SerialReader:
         data = []
         while not self.data_queue.empty():
             try:
-                data.append(self.data_queue.get_nowait())
+                item = self.data_queue.get_nowait()
             except queue.Empty:
                 break
+            # Блокирующий режим кладет в очередь пачки строк
+            if isinstance(item, list):
+                data.extend(item)
+            else:
+                data.append(item)
         return data
 
     def stop(self):
@@ -259,153 +795,1620 @@ class SerialReader:
         if self.serial:
             self.serial.close()
 
-class LogParser:
-    def __init__(self):
-        self.messages = defaultdict(list)  # Все события по ID пакета
-        self.packet_stats = {}  # Статистика по пакетам
-        self.busy_rx_count = 0
-        self.rx_count = 0
-        self.errors_count = 0
-        self.nodes = set()
-        self.start_time = time.time()
-        self.filter_webserver = True
-        self.time_correction = True
-        self.last_traceroute_event = None
-        self.to_file= True
+class FileFollower:
+    """
+    Следит за дописываемым файлом лога (как tail -F) и отдает новые строки.
+    Без filename следит за суточным файлом directory/YYYYMMDD.log и после полуночи
+    переходит на новый. Усеченный файл читается с начала, подмененный - открывается заново
+    """
+    def __init__(self, filename=None, directory='logs', poll_interval=0.2, from_start=True,
+                 chunk_size=1024 * 1024):
+        self.daily = filename is None
+        self.directory = directory
+        self.filename = filename or self.daily_filename()
+        self.poll_interval = poll_interval
+        self.from_start = from_start
+        self.chunk_size = chunk_size
+        self.file = None
+        self.offset = 0  # Позиция после последней отданной полной строки
+        self.running = False
+        self.data_queue = queue.Queue()
+        self.buffer = bytearray()
 
-    def parse_line(self, line):
-        """Парсит одну строку лога"""
-        if not line.strip():
-            return None
+    @property
+    def name(self):
+        return os.path.basename(self.filename)
 
-        # захватим traceroute
-        if "-->" in line and self.last_traceroute_event!=None:
-            self.last_traceroute_event["route"] = line
-        if "<--" in line and self.last_traceroute_event!=None:
-            self.last_traceroute_event["route_back"] = line
+    def daily_filename(self):
+        return os.path.join(self.directory, f"{datetime.now().strftime('%Y%m%d')}.log")
 
-        # error
-        if "Ignore received packet due to error" in line:
-            self.errors_count+=1
-            return
+    def start(self):
+        """Запускает слежение за файлом"""
+        try:
+            self.open_file()
+            self.running = True
+            thread = threading.Thread(target=self._follow)
+            thread.daemon = True
+            thread.start()
+            return True
+        except Exception as e:
+            print(f"Ошибка открытия файла {self.filename}: {e}")
+            return False
 
-        # ignore Neighbor
-        if "Neighbor" and 'node_id' in line:
+    def open_file(self):
+        """Открывает файл с начала или с конца (from_start)"""
+        if not self.daily or os.path.exists(self.filename):
+            self._open(self.filename, 0 if self.from_start else None)
+
+    def _open(self, filename, offset):
+        """Открывает файл с позиции offset (None - с конца)"""
+        if self.file:
+            self.file.close()
+        self.filename = filename
+        self.file = open(filename, 'rb')
+        self.offset = self.file.seek(0, os.SEEK_END) if offset is None else offset
+        self.file.seek(self.offset)
+        self.buffer.clear()
+
+    def _follow(self):
+        while self.running:
+            try:
+                lines = self.read_lines()
+                if lines:
+                    self.data_queue.put(lines)
+                elif lines is None and self.running:
+                    self.check_file()
+                    time.sleep(self.poll_interval)
+            except Exception as e:
+                if not self.running:
+                    break
+                print(f"Ошибка чтения файла {self.filename}: {e}")
+                time.sleep(1)
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def read_lines(self):
+        """Читает дописанное в файл, возвращает новые полные строки или None, если нового нет"""
+        if not self.file:
+            return None
+        data = self.file.read(self.chunk_size)
+        if not data:
+            return None
+        self.buffer += data
+        lines, consumed = split_lines(self.buffer)
+        self.offset += consumed
+        return lines
+
+    def check_file(self):
+        """Проверяет усечение, подмену и (в суточном режиме) смену файла"""
+        if self.daily:
+            filename = self.daily_filename()
+            if filename != self.filename and os.path.exists(filename):
+                # Старый файл дочитан до конца - переходим на файл новых суток
+                self._open(filename, 0)
+                return
+        if not os.path.exists(self.filename):
             return
+        st = os.stat(self.filename)
+        if not self.file:
+            self._open(self.filename, 0)
+        elif st.st_ino != os.fstat(self.file.fileno()).st_ino:
+            self._open(self.filename, 0)
+        elif st.st_size < self.offset + len(self.buffer):
+            print(f"Файл {self.filename} усечен, читаем с начала")
+            self._open(self.filename, 0)
 
-        # Извлекаем временную метку
-        time_match = re.search(r'(\d{2}:\d{2}:\d{2}\s+\d+)\s+\[', line)
-        if not time_match:
-            return None
+    def get_data(self):
+        """Возвращает данные из очереди"""
+        data = []
+        while not self.data_queue.empty():
+            try:
+                data.extend(self.data_queue.get_nowait())
+            except queue.Empty:
+                break
+        return data
 
-        timestamp = time_match.group(1).split()[0]
-        if self.time_correction:
-            timestamp = convert_with_local_offset(timestamp)
+    def stop(self):
+        """Останавливает слежение"""
+        self.running = False
 
 
+def parse_source_spec(spec):
+    """
+    Разбирает список источников "udp:1514, serial:/dev/ttyUSB0, file:logs/x.log"
+    в [(тип, параметр)]. "file:" без пути - суточный лог в logs
+    """
+    sources = []
+    for item in re.split(r'[,;\s]+', spec.strip()):
+        if not item:
+            continue
+        kind, sep, param = item.partition(':')
+        kind = kind.lower()
+        if not sep or kind not in ('udp', 'serial', 'file'):
+            raise ValueError(f"Неизвестный источник: {item}")
+        if kind == 'udp':
+            if not param.isdigit() or not 1 <= int(param) <= 65535:
+                raise ValueError(f"Некорректный UDP порт: {item}")
+            param = int(param)
+        elif kind == 'serial' and not param:
+            raise ValueError(f"Не указан порт: {item}")
+        sources.append((kind, param))
+    if not sources:
+        raise ValueError("Не указан ни один источник")
+    return sources
+
+
+class IngestProtocol:
+    """
+    Принимает syslog датаграммы для IngestEngine. Методы протокола датаграмм asyncio
+    без наследования от asyncio.DatagramProtocol - asyncio импортируется только при запуске
+    """
+    def __init__(self, engine, name):
+        self.engine = engine
+        self.name = name
 
-        # Ищем ID пакета
-        id_match = re.search(r'id=0x([0-9a-fA-F]+)', line)
-        packet_id = id_match.group(1) if id_match else None
+    def connection_made(self, transport):
+        pass
 
-        #fix id
-        if packet_id !=None :
-            packet_id = packet_id.zfill(8)
+    def connection_lost(self, exc):
+        pass
 
-        # Ищем отправителя
-        from_match = re.search(r'fr=0x([0-9a-fA-F]+)', line)
-        from_node = from_match.group(1) if from_match else None
+    def error_received(self, exc):
+        pass
 
-        if from_node==None:
-            from_match = re.search(r'from=0x([0-9a-fA-F]+)', line)
-            from_node = from_match.group(1) if from_match else None
+    def datagram_received(self, data, addr):
+        try:
+            lines, malformed = syslog_datagram_lines((data,))
+        except Exception as e:
+            print(f"Ошибка декодирования UDP данных: {e}")
+            return
+        self.engine.stats[self.name]['malformed'] += malformed
+        if lines:
+            self.engine.emit_nowait(self.name, lines)
 
 
-        # Ищем получателя
-        to_match = re.search(r'to=0x([0-9a-fA-F]+)', line)
-        to_node = to_match.group(1) if to_match else None
+class IngestEngine:
+    """
+    Принимает строки сразу из нескольких источников (UDP порты, последовательные
+    порты, дописываемые файлы) в одном цикле asyncio в отдельном потоке.
+    Строки отдаются пачками с именем источника через ограниченную очередь: при ее
+    переполнении последовательные порты и файлы ждут, UDP датаграммы отбрасываются
+    """
+    def __init__(self, sources, max_batches=10000, baudrate=115200, poll_interval=0.2):
+        self.sources = [(kind, param, f"{kind}:{param}") for kind, param in sources]
+        self.baudrate = baudrate
+        self.poll_interval = poll_interval
+        self.data_queue = queue.Queue(maxsize=max_batches)
+        self.pending = deque()  # Остаток пачки, не вошедший в get_data(max_lines)
+        self.followers = {}
+        self.to_file = True
+        self.running = False
+        self.loop = None
+        self.main_task = None
+        self.stats = {name: {'lines': 0, 'dropped': 0, 'malformed': 0, 'error': None}
+                      for kind, param, name in self.sources}
+
+    def start(self):
+        """Запускает цикл asyncio со всеми источниками"""
+        import asyncio
+        try:
+            self.loop = asyncio.new_event_loop()
+            self.main_task = self.loop.create_task(self._main())
+            self.running = True
+            thread = threading.Thread(target=self._run)
+            thread.daemon = True
+            thread.start()
+            return True
+        except Exception as e:
+            print(f"Ошибка запуска источников: {e}")
+            return False
 
-        # Ищем сообщение
-        msg_match = re.search(r'msg=(\d+)', line)
-        message = msg_match.group(1) if msg_match else None
+    def _run(self):
+        import asyncio
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.main_task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.loop.close()
+
+    async def _main(self):
+        import asyncio
+        readers = {'udp': self._read_udp, 'serial': self._read_serial, 'file': self._read_file}
+        await asyncio.gather(*(self._run_source(readers[kind], param, name)
+                               for kind, param, name in self.sources))
+
+    async def _run_source(self, reader, param, name):
+        """Запускает источник, после ошибки переподключается"""
+        import asyncio
+        while True:
+            try:
+                await reader(param, name)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats[name]['error'] = str(e)
+                print(f"Ошибка источника {name}: {e}")
+                await asyncio.sleep(5)
+
+    async def _read_udp(self, port, name):
+        transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: IngestProtocol(self, name), local_addr=('0.0.0.0', port))
+        self.stats[name]['error'] = None
+        try:
+            await self.loop.create_future()  # Принимаем до остановки
+        finally:
+            transport.close()
+
+    async def _read_serial(self, port, name):
+        # У pyserial нет асинхронного API - блокирующее чтение с таймаутом в пуле потоков
+        ser = await self.loop.run_in_executor(
+            None, functools.partial(serial.Serial, port=port, baudrate=self.baudrate, timeout=0.5))
+        self.stats[name]['error'] = None
+        buffer = bytearray()
+        try:
+            while True:
+                data = await self.loop.run_in_executor(None, ser.read, max(1, ser.in_waiting))
+                if not data:
+                    continue
+                buffer += data
+                lines, _ = split_lines(buffer)
+                if lines:
+                    await self.emit(name, lines)
+        finally:
+            ser.close()
+
+    async def _read_file(self, filename, name):
+        import asyncio
+        # После ошибки продолжаем с той же позиции, а не читаем файл заново
+        follower = self.followers.get(name)
+        if follower is None:
+            follower = FileFollower(filename or None, chunk_size=256 * 1024)
+            follower.open_file()
+            self.followers[name] = follower
+        self.stats[name]['error'] = None
+        try:
+            while True:
+                lines = follower.read_lines()
+                if lines:
+                    # Строки из файла уже записаны в лог - повторно не пишем
+                    await self.emit(name, lines, to_file=False)
+                elif lines is None:
+                    follower.check_file()
+                    await asyncio.sleep(self.poll_interval)
+        except asyncio.CancelledError:
+            if follower.file:
+                follower.file.close()
+            raise
+
+    async def emit(self, name, lines, to_file=True):
+        """Отдает пачку строк, при полной очереди ждет, пока GUI ее разберет"""
+        import asyncio
+        if to_file:
+            self._log(lines)
+        while True:
+            try:
+                self.data_queue.put_nowait((name, lines))
+                break
+            except queue.Full:
+                await asyncio.sleep(0.05)
+        self._count(name, lines)
 
-        # Ищем portnum
-        port_match = re.search(r'Portnum=(\d+)', line)
-        portnum = port_match.group(1) if port_match else None
+    def emit_nowait(self, name, lines):
+        """Отдает пачку строк без ожидания, при полной очереди отбрасывает ее (в лог она записана)"""
+        self._log(lines)
+        try:
+            self.data_queue.put_nowait((name, lines))
+        except queue.Full:
+            self.stats[name]['dropped'] += len(lines)
+            return
+        self._count(name, lines)
 
-        # Ищем len
-        len_match = re.search(r'len=(\d+)', line)
-        payload_len = len_match.group(1) if len_match else None
+    def _log(self, lines):
+        if self.to_file:
+            log_writer.write_lines(lines)
 
+    def _count(self, name, lines):
+        self.stats[name]['lines'] += len(lines)
 
-        # Определяем тип события
-        event_type = "OTHER"
-        relay_node = None
-        hop_lim = None
-        rx_snr = None
-        rx_rssi = None
+    def get_batches(self, max_lines=None):
+        """
+        Возвращает [(источник, строки)]. max_lines ограничивает объем за один вызов,
+        остальное остается в очереди и сдерживает источники
+        """
+        batches = []
+        count = 0
+        while max_lines is None or count < max_lines:
+            if self.pending:
+                batch = self.pending.popleft()
+            else:
+                try:
+                    batch = self.data_queue.get_nowait()
+                except queue.Empty:
+                    break
+            name, lines = batch
+            if max_lines is not None and count + len(lines) > max_lines:
+                rest = max_lines - count
+                self.pending.appendleft((name, lines[rest:]))
+                lines = lines[:rest]
+            batches.append((name, lines))
+            count += len(lines)
+        return batches
+
+    def get_data(self, max_lines=200000):
+        """Возвращает [(источник, строка)] из очереди - одним списком, но с именем источника"""
+        data = []
+        for name, lines in self.get_batches(max_lines):
+            data.extend((name, line) for line in lines)
+        return data
 
-        # Поиск ретранслятора
-        relay_match = re.search(r'relay=0x([0-9a-fA-F]+)', line)
-        if relay_match:
-            try:
-                relay_node = relay_match.group(1).upper()
-                if len(relay_node)<2:
-                    relay_node+="*"
-            except ValueError as e:
-                relay_node = None
+    def summary(self):
+        """Краткая сводка по источникам для статус бара"""
+        parts = []
+        for name, stats in self.stats.items():
+            part = f"{name}: {stats['lines']}"
+            if stats['dropped']:
+                part += f" (отброшено {stats['dropped']})"
+            if stats['malformed']:
+                part += f" (некорректных {stats['malformed']})"
+            if stats['error']:
+                part += " ⚠"
+            parts.append(part)
+        return ", ".join(parts)
 
-        # Поиск Hops
-        hop_lim = None 
-        hop_start = None
-        hops = None
-        hop_match = re.search(r'HopLim=(\d+)', line)
-        if hop_match:
+    def stop(self):
+        """Останавливает все источники"""
+        self.running = False
+        if self.loop and not self.loop.is_closed():
             try:
-                hop_lim = int(hop_match.group(1))
-            except ValueError as e:
-                hop_lim = None
+                self.loop.call_soon_threadsafe(self.main_task.cancel)
+            except RuntimeError:
+                pass  # Цикл уже закрыт
 
 
-        # Поиск HopStart
-        hop_match = re.search(r'hopStart=(\d+)', line)
-        if hop_match:
-            try:
-                hop_start = int(hop_match.group(1))
-            except ValueError as e:
-                hop_start = None
+# Кэш разобранного файла лога: JSON в каталоге кэша приложения, имя - хэш пути к логу.
+# Только данные (без pickle), чтобы подложенный рядом или в кэш файл не мог выполнить код.
+# Строки лога в кэш не копируются: событие хранит номер своей строки в файле
+INDEX_VERSION = 7
+INDEX_FINGERPRINT_SIZE = 4096
+INDEX_MAX_SIZE = 512 * 1024 * 1024  # Общий объем каталога кэша, байт
+INDEX_MAX_AGE = 30 * 86400  # Кэш, не открывавшийся дольше, удаляется, секунды
+INDEX_LOAD_COST = 0.25  # Загрузка байта кэша относительно разбора байта лога, с запасом
 
-        hops = None
-        if hop_start!=None and hop_lim !=None:
-            hops = hop_start - hop_lim
 
-        # Поиск SNR и RSSI
-        snr_match = re.search(r'rxSNR=([-\d.]+)', line)
-        if snr_match:
-            try:
-                rx_snr = float(snr_match.group(1))
-            except ValueError as e:
-                rx_snr = None
+def index_directory():
+    """Каталог кэша: %LOCALAPPDATA%, $XDG_CACHE_HOME или ~/.cache"""
+    base = (os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or
+            os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'logviewer', 'index')
 
-        rssi_match = re.search(r'rxRSSI=([-\d]+(?:\.\d+)?)', line)
-        if rssi_match:
-            rssi_str = rssi_match.group(1)
+
+def index_path(filename):
+    import hashlib
+    key = hashlib.sha1(os.path.abspath(filename).encode('utf-8', 'surrogateescape')).hexdigest()
+    return os.path.join(index_directory(), key + '.json')
+
+
+def index_key(settings, retention):
+    """
+    Все, от чего зависит результат разбора: настройки, ограничения хранения и,
+    с переводом времени в местное, смещение часового пояса (меняется с летним временем)
+    """
+    time_context = local_time_converter.context() if settings[0] else None
+    return [list(settings), list(retention), time_context]
+
+
+def read_fingerprint(f, offset):
+    """Последние INDEX_FINGERPRINT_SIZE байт перед offset (hex) - по ним видно, что начало файла не менялось"""
+    start = max(0, offset - INDEX_FINGERPRINT_SIZE)
+    f.seek(start)
+    return f.read(offset - start).hex()
+
+
+def read_log_lines(filename, offset):
+    """Строки файла до offset, разбитые так же, как при чтении FileLoader"""
+    with open(filename, 'rb') as f:
+        return f.read(offset).decode('utf-8', errors='ignore').splitlines()
+
+
+def load_log_index(filename, settings, retention):
+    """
+    Загружает кэш разбора файла. Возвращает (парсер, смещение, строк), где смещение -
+    конец уже разобранной части файла, или (None, 0, 0), если кэша нет или он устарел
+    """
+    path = index_path(filename)
+    try:
+        with open(path, 'r', encoding='utf-8') as f, gc_paused():
+            index = json.load(f)
+        if (index.get('version') != INDEX_VERSION or index['path'] != os.path.abspath(filename) or
+                index['key'] != index_key(settings, retention)):
+            return None, 0, 0
+        stat = os.stat(filename)
+        offset = index['offset']
+        if stat.st_size != index['size'] or stat.st_mtime_ns != index['mtime']:
+            # Файл дописан - годится, если начало совпадает; усечен или переписан - нет
+            if stat.st_size <= index['size']:
+                return None, 0, 0
+            with open(filename, 'rb') as f:
+                if read_fingerprint(f, offset) != index['fingerprint']:
+                    return None, 0, 0
+        with gc_paused():
+            parser = LogParser.from_state(index['parser'], read_log_lines(filename, offset))
+        parser.apply_settings(settings)
+        parser.apply_retention(retention)
+        os.utime(path)  # Время изменения кэша - время последнего использования (prune_log_index)
+        return parser, offset, index['lines']
+    except FileNotFoundError:
+        return None, 0, 0
+    except Exception as e:
+        print(f"Ошибка чтения кэша {path}: {e}")
+        return None, 0, 0
+
+
+def save_log_index(filename, parser, offset, lines_count):
+    """
+    Сохраняет состояние парсера после разбора файла до offset. Кэш, который загружался бы
+    не быстрее разбора (много коротких строк), не сохраняется: с ним и дописанный файл
+    дешевле разобрать целиком
+    """
+    path = index_path(filename)
+    try:
+        stat = os.stat(filename)
+        with open(filename, 'rb') as f:
+            fingerprint = read_fingerprint(f, offset)
+        line_numbers = {line.strip(): number
+                        for number, line in enumerate(read_log_lines(filename, offset))}
+        index = {
+            'version': INDEX_VERSION,
+            'path': os.path.abspath(filename),
+            'key': index_key(parser.get_settings(), parser.get_retention()),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'offset': offset,
+            'fingerprint': fingerprint,
+            'lines': lines_count
+        }
+        with gc_paused():
+            index['parser'] = parser.get_state(line_numbers)
+            # dumps, а не dump: dump пишет кусками через медленный кодировщик на Python
+            data = json.dumps(index, ensure_ascii=False, separators=(',', ':'))
+        del index, line_numbers
+        if len(data) * INDEX_LOAD_COST >= offset:
             try:
-                # Если есть точка - это float, иначе int
-                if '.' in rssi_str:
-                    rx_rssi = float(rssi_str)
-                else:
-                    rx_rssi = int(rssi_str)
-            except ValueError as e:
-                #print(f"Ошибка парсинга RSSI '{line}': {e} ")
-                rx_rssi = None
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_name = path + '.tmp'
+        with open(temp_name, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(temp_name, path)
+        prune_log_index(path)
+    except Exception as e:
+        print(f"Ошибка записи кэша {path}: {e}")
 
-        if 'Update changed' in line:
+
+def prune_log_index(keep):
+    """
+    Удаляет кэш, не открывавшийся дольше INDEX_MAX_AGE, и самый давний сверх
+    INDEX_MAX_SIZE. Только что записанный keep не трогает
+    """
+    now = time.time()
+    entries = []
+    total = os.path.getsize(keep)
+    with os.scandir(os.path.dirname(keep)) as scan:
+        for entry in scan:
+            if not entry.name.endswith('.json') or entry.path == keep:
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    for mtime, size, path in sorted(entries):
+        if total <= INDEX_MAX_SIZE and now - mtime <= INDEX_MAX_AGE:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+class FileLoader:
+    def __init__(self, filename, parser, chunk_size=1024 * 1024, use_index=False):
+        self.filename = filename
+        self.name = os.path.basename(filename)
+        self.parser = parser
+        self.chunk_size = chunk_size
+        self.use_index = use_index  # Брать разобранное из кэша (load_log_index) и дописывать его
+        self.running = False
+        self.finished = False
+        self.error = None
+        self.total_bytes = 0
+        self.bytes_read = 0
+        self.lines_read = 0
+        self.start_time = None
+        self.end_time = None
+        # Разобранные парсеры ждут слияния в self.parser в потоке его владельца
+        self.results = queue.Queue()
+
+    def start(self):
+        """Запускает чтение файла в фоновом потоке"""
+        try:
+            self.total_bytes = os.path.getsize(self.filename)
+        except OSError as e:
+            self.error = e
+            return False
+        self.start_time = time.time()
+        self.running = True
+        thread = threading.Thread(target=self._read_file)
+        thread.daemon = True
+        thread.start()
+        return True
+
+    def load(self):
+        """Читает файл в текущем потоке, ошибки пробрасывает"""
+        self.total_bytes = os.path.getsize(self.filename)
+        self.start_time = time.time()
+        self.running = True
+        self._read_file()
+        self.merge_results()
+        if self.error:
+            raise self.error
+
+    def merge_results(self):
+        """
+        Сливает готовые результаты в self.parser. Вызывается из потока, которому принадлежит
+        self.parser (в GUI - из poll_file_loader), а не из фонового потока загрузки
+        """
+        while True:
+            try:
+                file_parser = self.results.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self.parser.merge(file_parser)
+            except Exception as e:
+                self.error = e
+
+    def prepare_result(self, file_parser):
+        """Строит индекс строк разобранной части в фоновом потоке и отдает ее на слияние"""
+        if self.parser.text_index is not None and file_parser.text_index is None:
+            file_parser.build_text_index()
+        self.results.put(file_parser)
+
+    def _read_file(self):
+        """
+        Читает файл блоками по chunk_size и передает строки отдельному парсеру файла,
+        в конце отдает его на слияние в self.parser (merge_results)
+        """
+        try:
+            file_parser, offset = None, 0
+            if self.use_index:
+                file_parser, offset, self.lines_read = load_log_index(
+                    self.filename, self.parser.get_settings(), self.parser.get_retention())
+            if file_parser is None:
+                file_parser = LogParser()
+                file_parser.apply_settings(self.parser.get_settings())
+                file_parser.apply_retention(self.parser.get_retention())
+            self.bytes_read = offset
+            index_offset = offset
+
+            with open(self.filename, 'rb') as f:
+                f.seek(offset)
+                tail = b''
+                while self.running:
+                    chunk = f.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    self.bytes_read += len(chunk)
+                    data = tail + chunk
+                    # Неполную последнюю строку оставляем до следующего блока
+                    cut = data.rfind(b'\n') + 1
+                    tail = data[cut:]
+                    self._parse_lines(file_parser, data[:cut])
+                    offset += cut
+
+            if self.running:
+                # Индекс заканчивается на последней полной строке: недописанная строка
+                # живого лога будет разобрана заново при следующем открытии
+                if self.use_index and offset > index_offset:
+                    save_log_index(self.filename, file_parser, offset, self.lines_read)
+                if tail:
+                    self._parse_lines(file_parser, tail)
+            self.prepare_result(file_parser)
+        except Exception as e:
+            self.error = e
+        self.end_time = time.time()
+        self.running = False
+        self.finished = True
+
+    def _parse_lines(self, parser, data):
+        with gc_paused():
+            for line in data.decode('utf-8', errors='ignore').splitlines():
+                if not self.running:
+                    break
+                parser.parse_line(line.strip())
+                self.lines_read += 1
+
+    def get_progress(self):
+        """Возвращает прогресс загрузки и скорость"""
+        end = self.end_time or time.time()
+        elapsed = max(end - (self.start_time or end), 1e-6)
+        return {
+            'bytes_read': self.bytes_read,
+            'total_bytes': self.total_bytes,
+            'percent': 100.0 * self.bytes_read / self.total_bytes if self.total_bytes else 100.0,
+            'lines_read': self.lines_read,
+            'elapsed': elapsed,
+            'bytes_per_sec': self.bytes_read / elapsed,
+            'lines_per_sec': self.lines_read / elapsed
+        }
+
+    def stop(self):
+        """Отменяет загрузку"""
+        self.running = False
+
+# Временная метка строки лога: "HH:MM:SS <uptime> ["
+TIME_RE = re.compile(r'(\d{2}:\d{2}:\d{2}\s+\d+)\s+\[')
+
+# Значения полей key=value
+HEX_VALUE_RE = re.compile(r'0x([0-9a-fA-F]+)')
+DEC_VALUE_RE = re.compile(r'(\d+)')
+SNR_VALUE_RE = re.compile(r'([-\d.]+)')
+RSSI_VALUE_RE = re.compile(r'([-\d]+(?:\.\d+)?)')
+
+# Поля, которые ищет парсер. Последние две буквы имен не повторяются,
+# по ним сканер выбирает поле без перебора.
+FIELD_VALUE_PATTERNS = {
+    'id': HEX_VALUE_RE,
+    'fr': HEX_VALUE_RE,
+    'from': HEX_VALUE_RE,
+    'to': HEX_VALUE_RE,
+    'relay': HEX_VALUE_RE,
+    'msg': DEC_VALUE_RE,
+    'Portnum': DEC_VALUE_RE,
+    'len': DEC_VALUE_RE,
+    'HopLim': DEC_VALUE_RE,
+    'hopStart': DEC_VALUE_RE,
+    'rxSNR': SNR_VALUE_RE,
+    'rxRSSI': RSSI_VALUE_RE,
+}
+FIELDS_BY_SUFFIX = {key[-2:]: (key, pattern.match) for key, pattern in FIELD_VALUE_PATTERNS.items()}
+
+# Отдельные шаблоны старого парсера (LogParser.legacy_parser)
+LEGACY_FIELD_PATTERNS = (
+    ('id', r'id=0x([0-9a-fA-F]+)'),
+    ('fr', r'fr=0x([0-9a-fA-F]+)'),
+    ('from', r'from=0x([0-9a-fA-F]+)'),
+    ('to', r'to=0x([0-9a-fA-F]+)'),
+    ('msg', r'msg=(\d+)'),
+    ('Portnum', r'Portnum=(\d+)'),
+    ('len', r'len=(\d+)'),
+    ('relay', r'relay=0x([0-9a-fA-F]+)'),
+    ('HopLim', r'HopLim=(\d+)'),
+    ('hopStart', r'hopStart=(\d+)'),
+    ('rxSNR', r'rxSNR=([-\d.]+)'),
+    ('rxRSSI', r'rxRSSI=([-\d]+(?:\.\d+)?)'),
+)
+
+# Тип события по ключевому слову, проверяются по порядку - первое совпадение
+SIMRADIO_EVENTS = (
+    ("Start low level send", 'SIMRADIO_SEND'),
+    ("Decoded message", 'SIMRADIO_DECODED'),
+    ("Completed sending", 'SIMRADIO_SEND_COMPLETE'),
+    ('decoded message', 'SIMRADIO_DECODED'),
+)
+
+EVENT_KEYWORDS = (
+    ('enqueuing for send', 'SIMRADIO_ENQUEUING'),
+    ('Received text msg', 'RECEIVED_TEXT'),
+    ('Received nodeinfo', 'RECEIVED_NODEINFO'),
+    ('Received routing', 'RECEIVED_ROUTING'),
+    ('Received Admin', 'RECEIVED_ADMIN'),
+    ('Sending retransmission', 'RETRANSMISSION'),
+    ('Started Tx', 'START_TX'),
+    ('Lora RX', 'RX'),
+    ('Ignore dupe incoming msg', 'IGNORE_DUPLICATE'),
+    ('enqueue for send', 'QUEUED'),
+    ('Completed sending', 'TX_COMPLETE'),
+    ('Can not send yet, busyRx', 'BUSY_RX'),
+    ('decoded message', 'DECODED'),
+    ('Send response', 'SEND_RESPONSE'),
+    ('Enqueued local', 'ENQUEUED_LOCAL'),
+    ('Rx someone rebroadcasting for us', 'SOMEONE_REBROADCASTING_FOR_US'),
+    ('Forwarding to phone', 'TO_PHONE'),
+    ("handleReceived(LOCAL)", 'RECEIVED_LOCAL'),
+    ("handleReceived(REMOTE)", 'RECEIVED_REMOTE'),
+    ('Received DeviceTelemetry', 'TELEMETRY'),
+    ('Received position', 'POSITION'),
+    ('Received traceroute', 'TRACEROUTE'),
+    ('Routing sniffing', 'ROUTING_SNIFFING'),
+    ('cancelSending', 'CANCEL_SENDING'),
+    ('Reliable send failed', 'RELIABLE_SEND_FAILED'),
+)
+
+# Примерный объем памяти события вместе с raw_line без ее текста, байт
+EVENT_MEMORY_ESTIMATE = 420
+
+PACKET_TYPES = {
+    1: "Message",
+    3: "Position",
+    4: "NodeInfo",
+    67: "Telemetry",
+    70: "Traceroute",
+    71: "Neighbors",
+}
+
+
+def extract_fields(line):
+    """
+    Извлекает все поля key=value строки за один проход по знакам '='.
+    Для каждого поля берется первое подходящее вхождение, как у отдельных re.search
+    """
+    fields = {}
+    if '=' not in line:
+        return fields
+    parts = line.split('=')
+    left = parts[0]
+    for right in parts[1:]:
+        field = FIELDS_BY_SUFFIX.get(left[-2:])
+        if field is not None:
+            key, match_value = field
+            if key not in fields and left.endswith(key):
+                value_match = match_value(right)
+                if value_match:
+                    fields[key] = value_match.group(1)
+        left = right
+    return fields
+
+
+def classify_event(line):
+    """Определяет тип события по таблице ключевых слов"""
+    if 'SimRadio' in line:
+        table, event_type = SIMRADIO_EVENTS, 'SIMRADIO'
+    else:
+        table, event_type = EVENT_KEYWORDS, 'OTHER'
+    for keyword, keyword_type in table:
+        if keyword in line:
+            return keyword_type
+    return event_type
+
+
+class LogEvent:
+    """
+    Событие лога. Хранится в слотах вместо словаря (в несколько раз меньше памяти),
+    event['key'], 'key' in event, get() и to_dict() оставлены как у словаря
+    """
+    __slots__ = ('timestamp', 'raw_time', 'packet_id', 'from_node', 'to_node', 'message',
+                 'portnum', 'event_type', 'relay_node', 'hop_lim', 'hop_start', 'hops',
+                 'rx_snr', 'rx_rssi', 'len', 'raw_line',
+                 'route', 'route_back', 'source')
+    # Необязательные поля: route/route_back есть только у traceroute,
+    # source - у событий, принятых через IngestEngine (имя источника)
+    OPTIONAL = ('route', 'route_back', 'source')
+
+    def __init__(self, timestamp, raw_time, packet_id, from_node, to_node, message, portnum,
+                 event_type, relay_node, hop_lim, hop_start, hops, rx_snr, rx_rssi,
+                 payload_len, raw_line):
+        self.timestamp = timestamp
+        self.raw_time = raw_time
+        self.packet_id = packet_id
+        self.from_node = from_node
+        self.to_node = to_node
+        self.message = message
+        self.portnum = portnum
+        self.event_type = event_type
+        self.relay_node = relay_node
+        self.hop_lim = hop_lim
+        self.hop_start = hop_start
+        self.hops = hops
+        self.rx_snr = rx_snr
+        self.rx_rssi = rx_rssi
+        self.len = payload_len
+        self.raw_line = raw_line
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        try:
+            setattr(self, key, value)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __contains__(self, key):
+        return key in self.__slots__ and hasattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def keys(self):
+        return [key for key in self.__slots__ if hasattr(self, key)]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.keys()}
+
+    def __repr__(self):
+        return f"LogEvent({self.to_dict()!r})"
+
+    def __reduce__(self):
+        # Аргументы конструктора вместо словаря слотов - быстрее передается между процессами
+        args = (self.timestamp, self.raw_time, self.packet_id, self.from_node, self.to_node,
+                self.message, self.portnum, self.event_type, self.relay_node, self.hop_lim,
+                self.hop_start, self.hops, self.rx_snr, self.rx_rssi, self.len, self.raw_line)
+        optional = {key: getattr(self, key) for key in self.OPTIONAL if hasattr(self, key)}
+        return (LogEvent, args, optional or None)
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    def get_state(self):
+        """Поля события списком простых значений для кэша разобранного файла (JSON)"""
+        state = [self.timestamp, self.raw_time, self.packet_id, self.from_node, self.to_node,
+                 self.message, self.portnum, self.event_type, self.relay_node, self.hop_lim,
+                 self.hop_start, self.hops, self.rx_snr, self.rx_rssi, self.len, self.raw_line]
+        optional = {key: getattr(self, key) for key in self.OPTIONAL if hasattr(self, key)}
+        if optional:
+            state.append(optional)
+        return state
+
+    @classmethod
+    def from_state(cls, state, strings, lines=None):
+        """
+        Событие из get_state(). Повторяющиеся строки, как в parse_line, делаются общими:
+        strings - словарь строка -> ее первый экземпляр, общий для всех событий.
+        Вместо raw_line в состоянии может быть номер строки в lines (строки файла лога)
+        """
+        (timestamp, raw_time, packet_id, from_node, to_node, message, portnum, event_type,
+         relay_node, hop_lim, hop_start, hops, rx_snr, rx_rssi, payload_len, raw_line) = state[:16]
+        if isinstance(raw_line, int):
+            raw_line = lines[raw_line].strip()
+        share = strings.setdefault
+        event = cls(share(timestamp, timestamp), raw_time, share(packet_id, packet_id),
+                    share(from_node, from_node), share(to_node, to_node), message,
+                    share(portnum, portnum), share(event_type, event_type),
+                    share(relay_node, relay_node), hop_lim, hop_start, hops, rx_snr, rx_rssi,
+                    share(payload_len, payload_len), raw_line)
+        if len(state) > 16:
+            for key in cls.OPTIONAL:
+                if key in state[16]:
+                    setattr(event, key, state[16][key])
+        return event
+
+
+class Histogram:
+    """
+    Потоковая гистограмма с постоянным числом корзин: count/min/max/среднее точно,
+    перцентили - с точностью до ширины корзины. Значения вне [low, high)
+    попадают в крайние корзины
+    """
+    __slots__ = ('low', 'step', 'bins', 'count', 'total', 'min', 'max')
+
+    def __init__(self, low, high, step):
+        self.low = low
+        self.step = step
+        self.bins = [0] * int(round((high - low) / step))
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        index = int((value - self.low) / self.step)
+        if index < 0:
+            index = 0
+        elif index >= len(self.bins):
+            index = len(self.bins) - 1
+        self.bins[index] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Значение q-перцентиля (0..1) по середине корзины"""
+        if not self.count:
             return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index, n in enumerate(self.bins):
+            seen += n
+            if seen > rank:
+                value = self.low + (index + 0.5) * self.step
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def merge(self, other):
+        self.bins = [a + b for a, b in zip(self.bins, other.bins)]
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def get_state(self):
+        return list(self.__getstate__())
+
+    @classmethod
+    def from_state(cls, state):
+        histogram = cls.__new__(cls)
+        histogram.__setstate__(state)
+        return histogram
+
+    def summary(self):
+        """min/avg/p50/p90/max для экспорта"""
+        mean = self.mean()
+        return {
+            'min': self.min,
+            'avg': round(mean, 2) if mean is not None else None,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'max': self.max
+        }
 
 
+class NodeMetrics:
+    """Накопленные метрики приема одного узла (отправителя или ретранслятора)"""
+    __slots__ = ('packets', 'rx_count', 'duplicates', 'first_time', 'last_time', 'snr', 'rssi', 'hops')
 
-        # Определение типа события
+    def __init__(self):
+        self.packets = 0      # Разных пакетов (для отправителя)
+        self.rx_count = 0     # Принятых копий (Lora RX)
+        self.duplicates = 0   # Копий уже принятого пакета
+        self.first_time = None  # Секунды времени лога, см. MetricsAggregator.clock
+        self.last_time = None
+        self.snr = Histogram(-32, 16, 0.25)
+        self.rssi = Histogram(-160, 0, 1)
+        self.hops = defaultdict(int)  # Число хопов -> число приемов
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def get_state(self):
+        # Ключи hops - числа, поэтому списком пар, а не словарем JSON
+        return [self.packets, self.rx_count, self.duplicates, self.first_time, self.last_time,
+                self.snr.get_state(), self.rssi.get_state(), list(self.hops.items())]
+
+    @classmethod
+    def from_state(cls, state):
+        metrics = cls()
+        (metrics.packets, metrics.rx_count, metrics.duplicates, metrics.first_time,
+         metrics.last_time, snr, rssi, hops) = state
+        metrics.snr = Histogram.from_state(snr)
+        metrics.rssi = Histogram.from_state(rssi)
+        metrics.hops.update(hops)
+        return metrics
+
+    def shift(self, seconds):
+        """Сдвигает время (куски лога, разобранные с разных суток)"""
+        if self.first_time is not None:
+            self.first_time += seconds
+            self.last_time += seconds
+
+    def touch(self, seconds):
+        if self.first_time is None:
+            self.first_time = seconds
+        self.last_time = seconds
+
+    def merge(self, other):
+        self.packets += other.packets
+        self.rx_count += other.rx_count
+        self.duplicates += other.duplicates
+        if other.first_time is not None:
+            if self.first_time is None:
+                self.first_time = other.first_time
+            self.last_time = other.last_time
+        self.snr.merge(other.snr)
+        self.rssi.merge(other.rssi)
+        for hops, n in other.hops.items():
+            self.hops[hops] += n
+
+    def summary(self):
+        span = (self.last_time - self.first_time) if self.first_time is not None else 0
+        count = self.packets or self.rx_count
+        return {
+            'packets': self.packets,
+            'rx_count': self.rx_count,
+            'packets_per_hour': round(count * 3600 / span, 2) if span > 0 else None,
+            'duplicate_ratio': round(self.duplicates / self.rx_count, 3) if self.rx_count else None,
+            'snr': self.snr.summary(),
+            'rssi': self.rssi.summary(),
+            'hops': dict(sorted(self.hops.items()))
+        }
+
+
+# Параметры радио для оценки эфирного времени: пресет LongFast по умолчанию
+LORA_SF = 11
+LORA_BW = 250000
+LORA_CR = 1  # 4/5 (1..4 - от 4/5 до 4/8)
+LORA_PREAMBLE = 16
+LORA_HEADER_LEN = 16  # Заголовок пакета Meshtastic перед полезной нагрузкой
+
+
+def lora_airtime(payload_len, sf=LORA_SF, bw=LORA_BW, cr=LORA_CR, preamble=LORA_PREAMBLE):
+    """Время в эфире LoRa пакета, секунды (формула Semtech, явный заголовок, CRC)"""
+    symbol_time = (2 ** sf) / bw
+    low_rate = 1 if symbol_time > 0.016 else 0
+    size = payload_len + LORA_HEADER_LEN
+    payload_symbols = 8 + max(
+        -(-(8 * size - 4 * sf + 28 + 16) // (4 * (sf - 2 * low_rate))) * (cr + 4), 0)
+    return (preamble + 4.25) * symbol_time + payload_symbols * symbol_time
+
+
+AIRTIME_TABLE = [lora_airtime(n) for n in range(256)]
+
+# Окна скользящих метрик канала: название -> (ширина корзины, с), в каждом окне 60 корзин
+CHANNEL_WINDOWS = (('1m', 1), ('5m', 5), ('1h', 60))
+CHANNEL_BUCKETS = 60
+# Счетчики в корзине
+CH_RX, CH_TX, CH_BUSY, CH_RETRANSMIT, CH_AIRTIME = range(5)
+
+
+class ChannelMetrics:
+    """
+    Скользящие метрики канала за 1 мин / 5 мин / 1 ч: приемы, передачи, BusyRx,
+    ретрансляции и оценка эфирного времени. Для каждого окна кольцо из 60 корзин,
+    память постоянная, запрос суммирует 60 корзин
+    """
+    def __init__(self):
+        self.rings = [(width, [None] * CHANNEL_BUCKETS, [[0, 0, 0, 0, 0.0] for _ in range(CHANNEL_BUCKETS)])
+                      for name, width in CHANNEL_WINDOWS]
+        self.first_seconds = None
+        self.last_seconds = None
+        # Счетчики текущей секунды лога - в кольца переносятся при смене секунды (flush)
+        self.pending_seconds = None
+        self.pending = [0, 0, 0, 0, 0.0]
+
+    def add(self, seconds, counter, airtime=0.0):
+        if seconds != self.pending_seconds:
+            if seconds is None:
+                return
+            self.flush()
+            self.pending_seconds = seconds
+            if self.first_seconds is None:
+                self.first_seconds = seconds
+            if self.last_seconds is None or seconds > self.last_seconds:
+                self.last_seconds = seconds
+        pending = self.pending
+        pending[counter] += 1
+        pending[CH_AIRTIME] += airtime
+
+    def flush(self):
+        """Переносит счетчики текущей секунды в корзины окон"""
+        seconds = self.pending_seconds
+        if seconds is None:
+            return
+        pending = self.pending
+        self.pending_seconds = None
+        self.pending = [0, 0, 0, 0, 0.0]
+        for width, stamps, buckets in self.rings:
+            slot = int(seconds // width)
+            index = slot % CHANNEL_BUCKETS
+            stamp = stamps[index]
+            if stamp == slot:
+                # Корзина текущего слота - складываем на месте, без нового списка
+                bucket = buckets[index]
+                bucket[CH_RX] += pending[CH_RX]
+                bucket[CH_TX] += pending[CH_TX]
+                bucket[CH_BUSY] += pending[CH_BUSY]
+                bucket[CH_RETRANSMIT] += pending[CH_RETRANSMIT]
+                bucket[CH_AIRTIME] += pending[CH_AIRTIME]
+            elif stamp is None or stamp < slot:
+                stamps[index] = slot
+                buckets[index] = list(pending)
+            # Иначе секунда старше окна
+
+    def merge(self, other, shift=0):
+        """Добавляет корзины следующего по времени куска лога; shift - сдвиг его часов, с"""
+        self.flush()
+        other.flush()
+        if other.first_seconds is None:
+            return
+        for (width, stamps, buckets), (_, other_stamps, other_buckets) in zip(self.rings, other.rings):
+            slot_shift = shift // width
+            for other_stamp, other_bucket in zip(other_stamps, other_buckets):
+                if other_stamp is None:
+                    continue
+                stamp = other_stamp + slot_shift
+                index = stamp % CHANNEL_BUCKETS
+                if stamps[index] is None or stamps[index] < stamp:
+                    stamps[index] = stamp
+                    buckets[index] = list(other_bucket)
+                elif stamps[index] == stamp:
+                    buckets[index] = [a + b for a, b in zip(buckets[index], other_bucket)]
+        if self.first_seconds is None:
+            self.first_seconds = other.first_seconds + shift
+        self.last_seconds = max(self.last_seconds or 0, other.last_seconds + shift)
+
+    def get_state(self):
+        self.flush()
+        return {
+            'rings': [[stamps, buckets] for _, stamps, buckets in self.rings],
+            'first_seconds': self.first_seconds,
+            'last_seconds': self.last_seconds
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        channel = cls()
+        channel.rings = [(width, stamps, buckets)
+                         for (_, width), (stamps, buckets) in zip(CHANNEL_WINDOWS, state['rings'])]
+        channel.first_seconds = state['first_seconds']
+        channel.last_seconds = state['last_seconds']
+        return channel
+
+    def get_metrics(self):
+        """
+        Метрики по окнам, частоты - в минуту, загрузка канала - доля эфирного времени.
+        Эфирное время - сумма оценок по длине принятых и переданных пакетов для пресета
+        LORA_*: перекрывшиеся в эфире передачи складываются, при другом пресете или в начале
+        лога сумма может превысить прошедшее время, поэтому загрузка ограничена 100%
+        (airtime_seconds остается как есть)
+        """
+        result = {}
+        self.flush()
+        if self.last_seconds is None:
+            return result
+        for (name, _), (width, stamps, buckets) in zip(CHANNEL_WINDOWS, self.rings):
+            now_slot = int(self.last_seconds // width)
+            totals = [0, 0, 0, 0, 0.0]
+            for stamp, bucket in zip(stamps, buckets):
+                if stamp is not None and now_slot - CHANNEL_BUCKETS < stamp <= now_slot:
+                    totals = [a + b for a, b in zip(totals, bucket)]
+            # Пока лог короче окна, делим на фактически прошедшее время
+            span = min(width * CHANNEL_BUCKETS, self.last_seconds - self.first_seconds + 1)
+            minutes = span / 60
+            result[name] = {
+                'rx_per_min': round(totals[CH_RX] / minutes, 2),
+                'tx_per_min': round(totals[CH_TX] / minutes, 2),
+                'busy_rx_per_min': round(totals[CH_BUSY] / minutes, 2),
+                'retransmissions_per_min': round(totals[CH_RETRANSMIT] / minutes, 2),
+                'airtime_seconds': round(totals[CH_AIRTIME], 2),
+                'channel_utilization': min(round(totals[CH_AIRTIME] / span * 100, 1), 100.0)
+            }
+        return result
+
+
+class MetricsAggregator:
+    """
+    Инкрементальные метрики по отправителям (from_node) и ретрансляторам (relay_node)
+    и скользящие метрики канала. Обновляются в parse_line, если включен LogParser.collect_metrics;
+    память не зависит от числа событий, вытеснение пакетов их не уменьшает
+    """
+    def __init__(self):
+        self.by_node = {}
+        self.by_relay = {}
+        self.channel = ChannelMetrics()
+        self.first_seconds = None
+        self.last_seconds = None
+        self.last_timestamp = None
+        self.day_offset = 0
+
+    def clock(self, timestamp):
+        """
+        Переводит "HH:MM:SS" в секунды времени лога, монотонно через полночь:
+        время назад больше чем на 12 часов считается следующими сутками
+        """
+        if timestamp == self.last_timestamp:
+            return self.last_seconds
+        self.last_timestamp = timestamp
+        seconds = time_to_seconds(timestamp)
+        if seconds is None:
+            return self.last_seconds
+        seconds += self.day_offset
+        if self.last_seconds is None:
+            self.first_seconds = seconds
+        elif seconds < self.last_seconds - 43200:
+            self.day_offset += 86400
+            seconds += 86400
+        self.last_seconds = seconds
+        return seconds
+
+    def add_channel(self, timestamp, counter, payload_len=None):
+        """Событие канала (прием, передача, BusyRx, ретрансляция) для скользящих окон"""
+        airtime = 0.0
+        if payload_len:
+            try:
+                airtime = AIRTIME_TABLE[int(payload_len)]
+            except (ValueError, IndexError):
+                airtime = lora_airtime(int(payload_len)) if payload_len.isdigit() else 0.0
+        self.channel.add(self.clock(timestamp), counter, airtime)
+
+    def add_channel_early(self, timestamp, counter):
+        """
+        Событие канала из начала уже разобранного куска лога (до слияния): время
+        считается от первого события куска, часы clock не сдвигаются
+        """
+        seconds = time_to_seconds(timestamp)
+        if seconds is None or self.first_seconds is None:
+            return
+        if seconds < self.first_seconds - 43200:
+            seconds += 86400
+        self.channel.add(seconds, counter)
+
+    def get(self, table, key):
+        metrics = table.get(key)
+        if metrics is None:
+            metrics = table[key] = NodeMetrics()
+        return metrics
+
+    def add_packet(self, from_node, timestamp):
+        """Новый пакет от from_node"""
+        metrics = self.get(self.by_node, from_node)
+        metrics.packets += 1
+        metrics.touch(self.clock(timestamp))
+
+    def add_rx(self, event, duplicate):
+        """Принятая копия пакета (Lora RX): SNR, RSSI, хопы - отправителю и ретранслятору"""
+        seconds = self.clock(event.timestamp)
+        for table, key in ((self.by_node, event.from_node), (self.by_relay, event.relay_node)):
+            if key is None:
+                continue
+            metrics = self.get(table, key)
+            metrics.rx_count += 1
+            if duplicate:
+                metrics.duplicates += 1
+            metrics.touch(seconds)
+            if event.rx_snr is not None:
+                metrics.snr.add(event.rx_snr)
+            if event.rx_rssi is not None:
+                metrics.rssi.add(event.rx_rssi)
+            if event.hops is not None:
+                metrics.hops[event.hops] += 1
+
+    def remove_packet(self, from_node):
+        """Пакет, посчитанный новым в двух кусках лога"""
+        if from_node in self.by_node:
+            self.by_node[from_node].packets -= 1
+
+    def mark_duplicate(self, event):
+        """Копия, которая при раздельном разборе кусков лога была сочтена первой"""
+        for table, key in ((self.by_node, event.from_node), (self.by_relay, event.relay_node)):
+            if key in table:
+                table[key].duplicates += 1
+
+    def merge(self, other):
+        """Добавляет метрики следующего по времени куска лога, возвращает сдвиг его часов, с"""
+        # Часы другого куска начинались с нулевых суток - сдвигаем их за полночь, если нужно
+        shift = 0
+        if other.first_seconds is not None and self.last_seconds is not None:
+            while other.first_seconds + shift < self.last_seconds - 43200:
+                shift += 86400
+        for table, other_table in ((self.by_node, other.by_node), (self.by_relay, other.by_relay)):
+            for key, metrics in other_table.items():
+                if shift:
+                    metrics.shift(shift)
+                if key in table:
+                    table[key].merge(metrics)
+                else:
+                    table[key] = metrics
+        self.channel.merge(other.channel, shift)
+        if other.last_seconds is not None:
+            if self.first_seconds is None:
+                self.first_seconds = other.first_seconds + shift
+            self.last_seconds = other.last_seconds + shift
+            self.last_timestamp = other.last_timestamp
+            self.day_offset = other.day_offset + shift
+        return shift
+
+    def get_state(self):
+        return {
+            'by_node': {key: metrics.get_state() for key, metrics in self.by_node.items()},
+            'by_relay': {key: metrics.get_state() for key, metrics in self.by_relay.items()},
+            'channel': self.channel.get_state(),
+            'first_seconds': self.first_seconds,
+            'last_seconds': self.last_seconds,
+            'last_timestamp': self.last_timestamp,
+            'day_offset': self.day_offset
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        aggregator = cls()
+        aggregator.by_node = {sys.intern(key): NodeMetrics.from_state(metrics)
+                              for key, metrics in state['by_node'].items()}
+        aggregator.by_relay = {sys.intern(key): NodeMetrics.from_state(metrics)
+                               for key, metrics in state['by_relay'].items()}
+        aggregator.channel = ChannelMetrics.from_state(state['channel'])
+        aggregator.first_seconds = state['first_seconds']
+        aggregator.last_seconds = state['last_seconds']
+        aggregator.last_timestamp = state['last_timestamp']
+        aggregator.day_offset = state['day_offset']
+        return aggregator
+
+    def get_channel_metrics(self):
+        return self.channel.get_metrics()
+
+    def get_node_metrics(self):
+        return {key: metrics.summary() for key, metrics in self.by_node.items()}
+
+    def get_relay_metrics(self):
+        return {key: metrics.summary() for key, metrics in self.by_relay.items()}
+
+
+class PipelineDiagnostics:
+    """
+    Замеры конвейера GUI по тикам update_gui: глубина очереди источника, строк в секунду
+    (получено из источника / разобрано в события), время разбора и обновлений.
+    Пока enabled=False, GUI не делает замеров - остается одна проверка флага на тик
+    """
+    # Окно, по которому считаются строки в секунду
+    RATE_WINDOW = 10
+
+    def __init__(self):
+        self.enabled = False
+        self.startup = None  # Время запуска GUI, заполняет report_startup
+        self.reset()
+
+    def reset(self):
+        self.started = time.time()
+        self.ticks = 0
+        self.lines_ingested = 0
+        self.lines_parsed = 0
+        self.queue_depth = 0
+        self.rate_samples = deque()  # (время, получено, разобрано) на тик
+        self.histograms = {
+            'queue_depth': Histogram(0, 10000, 10),  # элементов в data_queue перед тиком
+            'tick_lines': Histogram(0, 100000, 100),  # строк за тик
+            'parse_ms': Histogram(0, 2000, 1),  # разбор всех строк тика
+            'parse_line_us': Histogram(0, 500, 1),  # в среднем на строку за тик
+            'update_statistics_ms': Histogram(0, 200, 0.5),  # статус бар без таблицы
+            'update_packets_table_ms': Histogram(0, 500, 0.5),
+            'tick_ms': Histogram(0, 3000, 2),  # тик целиком
+        }
+
+    def add_parse(self, queue_depth, lines, parsed, seconds):
+        """Тик: глубина очереди до выборки, строк получено и разобрано, время разбора"""
+        self.ticks += 1
+        self.lines_ingested += lines
+        self.lines_parsed += parsed
+        self.queue_depth = queue_depth
+        histograms = self.histograms
+        histograms['queue_depth'].add(queue_depth)
+        histograms['tick_lines'].add(lines)
+        histograms['parse_ms'].add(seconds * 1000)
+        if lines:
+            histograms['parse_line_us'].add(seconds * 1e6 / lines)
+
+        now = time.monotonic()
+        self.rate_samples.append((now, lines, parsed))
+        while now - self.rate_samples[0][0] > self.RATE_WINDOW:
+            self.rate_samples.popleft()
+
+    def add_time(self, name, seconds):
+        self.histograms[name + '_ms'].add(seconds * 1000)
+
+    def rates(self):
+        """Строк в секунду за последние RATE_WINDOW секунд: (получено, разобрано)"""
+        if len(self.rate_samples) < 2:
+            return 0, 0
+        elapsed = self.rate_samples[-1][0] - self.rate_samples[0][0]
+        # Строки первого тика окна пришли до его начала
+        lines = sum(sample[1] for sample in self.rate_samples) - self.rate_samples[0][1]
+        parsed = sum(sample[2] for sample in self.rate_samples) - self.rate_samples[0][2]
+        return lines / elapsed, parsed / elapsed
+
+    def dump(self):
+        """Все замеры для JSON"""
+        ingested_rate, parsed_rate = self.rates()
+        return {
+            'enabled': self.enabled,
+            'seconds': round(time.time() - self.started, 1),
+            'ticks': self.ticks,
+            'lines_ingested': self.lines_ingested,
+            'lines_parsed': self.lines_parsed,
+            'ingested_per_sec': round(ingested_rate, 1),
+            'parsed_per_sec': round(parsed_rate, 1),
+            'queue_depth': self.queue_depth,
+            'startup': self.startup,
+            'histograms': {name: histogram.summary() for name, histogram in self.histograms.items()}
+        }
+
+
+# Слова для полнотекстового индекса - все, кроме ASCII пробелов и пунктуации
+TOKEN_RE = re.compile(r'[^ \t\n\r\x0b\x0c' + re.escape(string.punctuation) + r']+')
+TOKEN_DELIMITERS = bytes.maketrans(string.punctuation.encode(), b' ' * len(string.punctuation))
+
+
+def tokenize(line):
+    """
+    Множество слов строки (то же деление, что у TOKEN_RE). Через bytes - заметно быстрее,
+    но в нижний регистр переводятся только ASCII буквы
+    """
+    return set(line.encode('utf-8', 'ignore').lower().translate(TOKEN_DELIMITERS).decode('utf-8', 'ignore').split())
+
+
+class TextIndex:
+    """
+    Инвертированный индекс слов сырых строк: слово в нижнем регистре -> множество
+    ID пакетов. Поиск подстроки берет пакеты, содержащие все слова запроса (крайние
+    слова могут быть частью слова строки - для них просматривается словарь слов),
+    и проверяет их строки. Слова, которые есть в большинстве пакетов (имена полей,
+    модули), поиск не сужают и не хранятся
+    """
+    # Если крайнее слово запроса - часть слишком многих слов словаря, оно не сужает поиск
+    MAX_PARTIAL_TOKENS = 2000
+    # Доля пакетов, начиная с которой слово считается частым, и минимум пакетов для проверки
+    DENSE_FRACTION = 0.2
+    DENSE_MIN_PACKETS = 1000
+
+    def __init__(self):
+        self.postings = defaultdict(set)
+        self.dense = set()  # Частые слова без списка пакетов
+
+    def add(self, packet_id, line):
+        postings = self.postings
+        for token in tokenize(line) - self.dense:
+            postings[token].add(packet_id)
+
+    def remove(self, packet_id, lines):
+        tokens = set()
+        for line in lines:
+            tokens |= tokenize(line)
+        for token in tokens:
+            packet_ids = self.postings.get(token)
+            if packet_ids is not None:
+                packet_ids.discard(packet_id)
+                if not packet_ids:
+                    del self.postings[token]
+
+    def compact(self, packets_count):
+        """Переводит слова, встречающиеся в большой доле пакетов, в частые"""
+        if packets_count < self.DENSE_MIN_PACKETS:
+            return
+        limit = packets_count * self.DENSE_FRACTION
+        dense = [token for token, packet_ids in self.postings.items() if len(packet_ids) > limit]
+        for token in dense:
+            del self.postings[token]
+        self.dense.update(dense)
+
+    def merge(self, other):
+        self.dense |= other.dense
+        for token, packet_ids in other.postings.items():
+            if token not in self.dense:
+                self.postings[token] |= packet_ids
+        for token in other.dense:
+            self.postings.pop(token, None)
+
+    def candidates(self, text):
+        """
+        Множество ID пакетов, среди которых есть все строки с text (в нижнем регистре),
+        или None, если индекс не сужает поиск
+        """
+        sets = []
+        for match in TOKEN_RE.finditer(text):
+            token = match.group()
+            if not token.isascii():
+                continue  # Регистр не-ASCII букв в индексе не приведен - по слову не отобрать
+            open_left = match.start() == 0
+            open_right = match.end() == len(text)
+            if open_left and open_right:
+                accept = lambda t: token in t
+            elif open_left:
+                accept = lambda t: t.endswith(token)
+            elif open_right:
+                accept = lambda t: t.startswith(token)
+            else:
+                accept = None
+            if accept is None:
+                if token not in self.dense:
+                    sets.append(self.postings.get(token, set()))
+                continue
+            # Подходит частое слово - по этому слову запроса пакеты не отобрать
+            if any(accept(t) for t in self.dense):
+                continue
+            matched = [t for t in self.postings if accept(t)]
+            if len(matched) <= self.MAX_PARTIAL_TOKENS:
+                sets.append(set().union(*(self.postings[t] for t in matched)))
+        if not sets:
+            return None
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+
+class LogParser:
+    def __init__(self):
+        self.messages = defaultdict(list)  # Все события по ID пакета
+        self.packet_stats = {}  # Статистика по пакетам
+        self.busy_rx_count = 0
+        self.rx_count = 0
+        self.errors_count = 0
+        self.nodes = set()
+        self.start_time = time.time()
+        self.filter_webserver = True
+        self.time_correction = True
+        self.last_traceroute_event = None
+        self.to_file= True
+        self.legacy_parser = False  # Старый разбор (re.search на каждое поле) для сверки
+        self.retransmitted_count = 0  # Пакетов с START_TX
+        self.delay_sum = 0  # Сумма ненулевых задержек ретрансляции
+        self.delay_count = 0
+        self.track_changes = False  # Копить changed_packets (нужно только таблице GUI)
+        self.changed_packets = {}  # ID пакетов, изменившихся после take_changed_packets (по порядку)
+
+        # Ограничения хранения, None - без ограничения
+        self.max_packets = None
+        self.max_age = None  # Секунды времени лога (MetricsAggregator.clock) от первого события пакета
+        self.max_memory = None  # Байты по оценке memory_estimate
+        self.packet_order = deque()  # (ID пакета, время лога первого события, с) от старых к новым
+        self.memory_estimate = 0
+        self.evicted_packets = 0
+        self.evicted_events = 0
+        self.collect_metrics = False  # Вести metrics по узлам, ретрансляторам и каналу (GUI, экспорт --metrics)
+        self.metrics = MetricsAggregator()
+
+        # Вторичные индексы для query(): значение -> множество ID пакетов.
+        # Пока indexed=False, не ведутся - их построит первый query() (build_indexes)
+        self.indexed = False
+        self.index_node = defaultdict(set)  # from_node и to_node пакета
+        self.index_type = defaultdict(set)  # packet_type
+        self.index_relay = defaultdict(set)
+        self.index_event = defaultdict(set)  # Типы событий пакета
+        # Индекс времени первого события: "HH:MM:SS" -> ID пакетов в порядке поступления
+        # и отсортированный список этих секунд (не больше 86400, пустые секунды остаются)
+        self.time_buckets = {}
+        self.time_keys = []
+        self.text_index = None  # TextIndex для поиска по сырым строкам, строится первым поиском по тексту
+
+    def get_settings(self):
+        """Настройки, от которых зависит результат разбора"""
+        return (self.time_correction, self.filter_webserver, self.legacy_parser, self.collect_metrics)
+
+    def apply_settings(self, settings):
+        self.time_correction, self.filter_webserver, self.legacy_parser, self.collect_metrics = settings
+
+    def get_retention(self):
+        """Ограничения хранения: (max_packets, max_age, max_memory)"""
+        return (self.max_packets, self.max_age, self.max_memory)
+
+    def apply_retention(self, retention):
+        self.max_packets, self.max_age, self.max_memory = retention
+
+    def extract_fields_legacy(self, line):
+        """Старый разбор полей: отдельный re.search на каждое поле"""
+        fields = {}
+        for key, pattern in LEGACY_FIELD_PATTERNS:
+            match = re.search(pattern, line)
+            if match:
+                fields[key] = match.group(1)
+        return fields
+
+    def classify_event_legacy(self, line):
+        """Старое определение типа события цепочкой if/elif"""
+        event_type = "OTHER"
         if 'SimRadio' in line:
             if "Start low level send" in line:
                 event_type = 'SIMRADIO_SEND'            
@@ -434,9 +2437,7 @@ class LogParser:
         elif 'Started Tx' in line:
             event_type = 'START_TX'
         elif 'Lora RX' in line:
-            if 'Ignore dupe' not in line:
-                event_type = 'RX'
-            self.rx_count +=1
+            event_type = 'RX'
         elif 'Ignore dupe incoming msg' in line:
             event_type = 'IGNORE_DUPLICATE'
         elif 'enqueue for send' in line:
@@ -445,7 +2446,6 @@ class LogParser:
             event_type = 'TX_COMPLETE'
         elif 'Can not send yet, busyRx' in line:
             event_type = 'BUSY_RX'
-            self.busy_rx_count += 1
         elif 'decoded message' in line:
             event_type = 'DECODED'
         elif 'Send response' in line:
@@ -472,14 +2472,122 @@ class LogParser:
             event_type = 'CANCEL_SENDING'
         elif 'Reliable send failed' in line:
             event_type = 'RELIABLE_SEND_FAILED'
-        
+        return event_type
+
+    def parse_line(self, line):
+        """Парсит одну строку лога"""
+        if not line.strip():
+            return None
+
+        # захватим traceroute
+        if "-->" in line and self.last_traceroute_event!=None:
+            self.last_traceroute_event["route"] = line
+        if "<--" in line and self.last_traceroute_event!=None:
+            self.last_traceroute_event["route_back"] = line
+
+        # error
+        if "Ignore received packet due to error" in line:
+            self.errors_count+=1
+            return
 
+        # ignore Neighbor
+        if "Neighbor" and 'node_id' in line:
+            return
 
+        # Извлекаем временную метку
+        time_match = TIME_RE.search(line)
+        if not time_match:
+            return None
 
+        timestamp = time_match.group(1).split()[0]
+        if self.time_correction:
+            timestamp = convert_with_local_offset(timestamp)
 
+        if self.legacy_parser:
+            fields = self.extract_fields_legacy(line)
+        else:
+            fields = extract_fields(line)
 
-            
+        # Ищем ID пакета
+        packet_id = fields.get('id')
+
+        #fix id
+        if packet_id !=None :
+            packet_id = packet_id.zfill(8)
 
+        # Ищем отправителя
+        from_node = fields.get('fr')
+        if from_node==None:
+            from_node = fields.get('from')
+
+        # Ищем получателя, сообщение, portnum, len
+        to_node = fields.get('to')
+        message = fields.get('msg')
+        portnum = fields.get('Portnum')
+        payload_len = fields.get('len')
+
+        # Поиск ретранслятора
+        relay_node = fields.get('relay')
+        if relay_node != None:
+            relay_node = relay_node.upper()
+            if len(relay_node)<2:
+                relay_node+="*"
+
+        # Поиск Hops
+        hop_lim = None 
+        if 'HopLim' in fields:
+            hop_lim = int(fields['HopLim'])
+
+        # Поиск HopStart
+        hop_start = None
+        if 'hopStart' in fields:
+            hop_start = int(fields['hopStart'])
+
+        hops = None
+        if hop_start!=None and hop_lim !=None:
+            hops = hop_start - hop_lim
+
+        # Поиск SNR и RSSI
+        rx_snr = None
+        if 'rxSNR' in fields:
+            try:
+                rx_snr = float(fields['rxSNR'])
+            except ValueError as e:
+                rx_snr = None
+
+        rx_rssi = None
+        if 'rxRSSI' in fields:
+            rssi_str = fields['rxRSSI']
+            try:
+                # Если есть точка - это float, иначе int
+                if '.' in rssi_str:
+                    rx_rssi = float(rssi_str)
+                else:
+                    rx_rssi = int(rssi_str)
+            except ValueError as e:
+                #print(f"Ошибка парсинга RSSI '{line}': {e} ")
+                rx_rssi = None
+
+        if 'Update changed' in line:
+            return None
+
+        # Определение типа события
+        if self.legacy_parser:
+            event_type = self.classify_event_legacy(line)
+        else:
+            event_type = classify_event(line)
+
+        collect_metrics = self.collect_metrics
+        if event_type == 'RX':
+            self.rx_count +=1
+            if collect_metrics:
+                self.metrics.add_channel(timestamp, CH_RX, payload_len)
+            if 'Ignore dupe' in line:
+                event_type = 'OTHER'
+        elif event_type == 'BUSY_RX':
+            self.busy_rx_count += 1
+            if collect_metrics:
+                self.metrics.add_channel(timestamp, CH_BUSY)
 
         # Добавляем информацию о узлах
         if from_node:
@@ -490,87 +2598,294 @@ class LogParser:
                 return None
 
 
-        # Создаем запись о событии
-        event = {
-            'timestamp': timestamp,
-            'raw_time': time.time(),
-            'packet_id': packet_id,
-            'from_node': from_node,
-            'to_node': to_node,
-            'message': message,
-            'portnum': portnum,
-            'event_type': event_type,
-            'relay_node': relay_node,
-            'hop_lim': hop_lim,
-            'hop_start': hop_start,
-            'hops': hops,
-            'rx_snr': rx_snr,
-            'rx_rssi': rx_rssi,
-            'len': payload_len,  
-            'raw_line': line
-        }
-
-
-        
+        # Создаем запись о событии. Повторяющиеся строки (время, узлы, ID) интернируются,
+        # чтобы события одного пакета и узла ссылались на одну строку (None остается None)
+        intern = sys.intern
+        event = LogEvent(
+            intern(timestamp),
+            time.time(),
+            packet_id and intern(packet_id),
+            from_node and intern(from_node),
+            to_node and intern(to_node),
+            message,
+            portnum and intern(portnum),
+            event_type,
+            relay_node and intern(relay_node),
+            hop_lim,
+            hop_start,
+            hops,
+            rx_snr,
+            rx_rssi,
+            payload_len and intern(payload_len),
+            line
+        )
+        packet_id = event.packet_id
+        from_node = event.from_node
+        to_node = event.to_node
 
         # Сохраняем пакет
         if packet_id:
             self.messages[packet_id].append(event)
+            self.memory_estimate += EVENT_MEMORY_ESTIMATE + len(line)
+            if self.track_changes:
+                self.changed_packets[packet_id] = None
 
             # Обновляем статистику пакета
-            if packet_id not in self.packet_stats:
-                self.packet_stats[packet_id] = {
+            stats = self.packet_stats.get(packet_id)
+            new_packet = stats is None
+            if new_packet:
+                stats = self.packet_stats[packet_id] = {
                     'first_seen': timestamp,
                     'last_seen': timestamp,
                     'packet_type': None,
                     'received_times': [],
                     'retransmission_time': None,
+                    'delay_seconds': None,
                     'message': message,
                     'from_node': from_node,
                     'to_node': to_node,
                     'duplicate_count': 0,
+                    'rx_count': 0,
                     'relays': [],
-                    'events': []
+                    'events': self.messages[packet_id]  # Тот же список, что и messages
                 }
-
-            if self.packet_stats[packet_id]['packet_type']==None and portnum:
-                packet_type = None
+                self.packet_order.append((packet_id, self.metrics.clock(timestamp)))
+                if collect_metrics and from_node:
+                    self.metrics.add_packet(from_node, timestamp)
+                if self.indexed:
+                    self.index_new_packet(packet_id, timestamp, from_node, to_node)
+                if self.text_index is not None and len(self.packet_stats) % 1024 == 0:
+                    self.text_index.compact(len(self.packet_stats))
+
+            indexed = self.indexed
+            if stats['packet_type'] is None and portnum:
                 portnum = int(portnum)
-                if portnum==1:
-                    packet_type = "Message"
-                elif portnum==4:
-                    packet_type = "NodeInfo"
-                elif portnum==3: 
-                    packet_type = "Position"
-                elif portnum==70:
-                    packet_type = "Traceroute"
-                elif portnum==71:
-                    packet_type = "Neighbors"
-                elif portnum==67: 
-                    packet_type = "Telemetry"
-                else:
-                    packet_type = portnum
-                self.packet_stats[packet_id]['packet_type'] = packet_type
+                stats['packet_type'] = PACKET_TYPES.get(portnum, portnum)
+                if indexed:
+                    self.index_type[stats['packet_type']].add(packet_id)
+            if indexed:
+                self.index_event[event_type].add(packet_id)
+            if self.text_index is not None:
+                self.text_index.add(packet_id, line)
+
+            stats['last_seen'] = timestamp
+            if event_type == "RX":
+                if collect_metrics:
+                    self.metrics.add_rx(event, stats['rx_count'] > 0)
+                stats['rx_count'] += 1
+                if relay_node != None:
+                    stats['relays'].append(relay_node)
+                    if indexed:
+                        self.index_relay[relay_node].add(packet_id)
+            elif event_type == 'RECEIVED_TEXT':
+                stats['received_times'].append(timestamp)
+            elif event_type == 'START_TX':
+                self.set_retransmission_time(stats, timestamp)
+                if collect_metrics:
+                    # Передача пакета, принятого из эфира, - ретрансляция
+                    if stats['rx_count']:
+                        self.metrics.add_channel(timestamp, CH_RETRANSMIT)
+                    self.metrics.add_channel(timestamp, CH_TX, payload_len)
+            elif event_type == 'IGNORE_DUPLICATE':
+                stats['duplicate_count'] += 1
+            elif event_type == 'TRACEROUTE':
+                self.last_traceroute_event = event
 
+            # Пакетов и их возраста прибавляется только с новым пакетом, памяти - с каждым событием
+            if ((new_packet and (self.max_packets is not None or self.max_age is not None)) or
+                    (self.max_memory is not None and self.memory_estimate > self.max_memory)):
+                self.enforce_retention()
 
+        return event
 
-            self.packet_stats[packet_id]['last_seen'] = timestamp
-            self.packet_stats[packet_id]['events'].append(event)
-            if relay_node != None and event_type=="RX":
-                self.packet_stats[packet_id]['relays'].append(relay_node)
+    def enforce_retention(self):
+        """Вытесняет самые старые пакеты сверх ограничений хранения"""
+        order = self.packet_order
+        if self.max_packets is not None:
+            while len(order) > self.max_packets:
+                self.evict_oldest_packet()
+        if self.max_age is not None and self.metrics.last_seconds is not None:
+            # Возраст - по часам лога, как у метрик и индекса времени: файл прошлых суток
+            # при загрузке не вытесняется целиком. Пакеты без времени уходят первыми
+            oldest_allowed = self.metrics.last_seconds - self.max_age
+            while order and (order[0][1] is None or order[0][1] < oldest_allowed):
+                self.evict_oldest_packet()
+        if self.max_memory is not None:
+            while order and self.memory_estimate > self.max_memory:
+                self.evict_oldest_packet()
+
+    def evict_oldest_packet(self):
+        """Удаляет самый старый пакет и его события"""
+        packet_id, _ = self.packet_order.popleft()
+        stats = self.packet_stats.pop(packet_id)
+        events = self.messages.pop(packet_id, [])
+        if self.indexed or self.text_index is not None:
+            self.unindex_packet(packet_id, stats, events)
+
+        if stats['retransmission_time']:
+            self.retransmitted_count -= 1
+        if stats['delay_seconds']:
+            self.delay_sum -= stats['delay_seconds']
+            self.delay_count -= 1
+        for event in events:
+            self.memory_estimate -= EVENT_MEMORY_ESTIMATE + len(event.raw_line)
 
-            if event_type == 'RECEIVED_TEXT':
-                self.packet_stats[packet_id]['received_times'].append(timestamp)
-            elif event_type == 'START_TX':
-                self.packet_stats[packet_id]['retransmission_time'] = timestamp
-            elif event_type == 'IGNORE_DUPLICATE':
-                self.packet_stats[packet_id]['duplicate_count'] += 1
+        self.evicted_packets += 1
+        self.evicted_events += len(events)
+        if self.track_changes:
+            self.changed_packets[packet_id] = None
 
-            if event_type=='TRACEROUTE': 
-                self.last_traceroute_event = event
+    def index_new_packet(self, packet_id, timestamp, from_node, to_node):
+        """Добавляет новый пакет в индексы узлов и времени"""
+        if from_node:
+            self.index_node[from_node].add(packet_id)
+        if to_node:
+            self.index_node[to_node].add(packet_id)
+        bucket = self.time_buckets.get(timestamp)
+        if bucket is None:
+            # Новая секунда; после полуночи вставка в середину, но секунд в сутках немного
+            bucket = self.time_buckets[timestamp] = []
+            if not self.time_keys or timestamp > self.time_keys[-1]:
+                self.time_keys.append(timestamp)
+            else:
+                bisect.insort(self.time_keys, timestamp)
+        bucket.append(packet_id)
+
+    def index_packet_details(self, packet_id, packet_type, relays, events):
+        """Добавляет в индексы тип пакета, ретрансляторы и типы событий"""
+        if packet_type is not None:
+            self.index_type[packet_type].add(packet_id)
+        for relay in relays:
+            self.index_relay[relay].add(packet_id)
+        for event in events:
+            self.index_event[event.event_type].add(packet_id)
+
+    def unindex_packet(self, packet_id, stats, events):
+        """Убирает вытесненный пакет из всех индексов"""
+        if self.text_index is not None:
+            self.text_index.remove(packet_id, [event.raw_line for event in events])
+        if not self.indexed:
+            return
+        keys = [(self.index_node, stats['from_node']), (self.index_node, stats['to_node']),
+                (self.index_type, stats['packet_type'])]
+        keys += [(self.index_relay, relay) for relay in set(stats['relays'])]
+        keys += [(self.index_event, event_type) for event_type in set(e.event_type for e in events)]
+        for index, key in keys:
+            packet_ids = index.get(key)
+            if packet_ids is not None:
+                packet_ids.discard(packet_id)
+                if not packet_ids:
+                    del index[key]
+
+        # Вытесняется самый старый пакет - обычно первый в своей секунде
+        bucket = self.time_buckets[stats['first_seen']]
+        if bucket[0] == packet_id:
+            del bucket[0]
+        else:
+            bucket.remove(packet_id)
+
+    def build_indexes(self):
+        """Строит индексы query() по уже разобранным пакетам, дальше их ведет parse_line"""
+        self.indexed = True
+        for packet_id, _ in self.packet_order:
+            stats = self.packet_stats[packet_id]
+            self.index_new_packet(packet_id, stats['first_seen'], stats['from_node'], stats['to_node'])
+            self.index_packet_details(packet_id, stats['packet_type'], stats['relays'], stats['events'])
+
+    def filter_sets(self, node=None, packet_type=None, relay=None, event_type=None):
+        """Множества ID пакетов по заданным фильтрам, значение фильтра - одно или список"""
+        if not self.indexed:
+            self.build_indexes()
+        sets = []
+        for index, value in ((self.index_node, node), (self.index_type, packet_type),
+                             (self.index_relay, relay), (self.index_event, event_type)):
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set, frozenset)):
+                sets.append(set().union(*(index.get(v, ()) for v in value)))
+            else:
+                sets.append(index.get(value, set()))
+        return sets
+
+    def query(self, node=None, packet_type=None, relay=None, event_type=None, time_from=None, time_to=None,
+              text=None):
+        """
+        ID пакетов, подходящих под все фильтры, в порядке времени первого события.
+        node (from или to), packet_type, relay, event_type - значение или список значений;
+        time_from/time_to - "HH:MM:SS" включительно; text - подстрока сырой строки
+        какого-либо события пакета, без учета регистра
+        """
+        if not self.indexed:
+            self.build_indexes()
+        start = bisect.bisect_left(self.time_keys, time_from) if time_from else 0
+        end = bisect.bisect_right(self.time_keys, time_to) if time_to else len(self.time_keys)
+        buckets = self.time_buckets
+        ordered = [packet_id for key in self.time_keys[start:end] for packet_id in buckets[key]]
+        sets = self.filter_sets(node, packet_type, relay, event_type)
+        if text:
+            text = text.lower()
+            if self.text_index is None:
+                # Индекс строк нужен только поиску по тексту - строим при первом поиске
+                self.build_text_index()
+            candidates = self.text_index.candidates(text)
+            if candidates is not None:
+                sets.append(candidates)
+        if sets:
+            sets.sort(key=len)
+            matched = sets[0].intersection(*sets[1:])
+            if not matched:
+                return []
+            result = [packet_id for packet_id in ordered if packet_id in matched]
+        else:
+            result = ordered
+        if text:
+            result = [packet_id for packet_id in result if self.packet_contains(packet_id, text)]
+        return result
 
+    def packet_contains(self, packet_id, text):
+        """Есть ли text (в нижнем регистре) в сырых строках пакета"""
+        return any(text in event.raw_line.lower() for event in self.messages.get(packet_id, ()))
 
-        return event
+    def packet_matches(self, packet_id, node=None, packet_type=None, relay=None, event_type=None,
+                       time_from=None, time_to=None, text=None):
+        """Проверяет один пакет на те же фильтры, что и query()"""
+        stats = self.packet_stats.get(packet_id)
+        if stats is None:
+            return False
+        if (time_from and stats['first_seen'] < time_from) or (time_to and stats['first_seen'] > time_to):
+            return False
+        if not self.indexed:
+            self.build_indexes()
+        for index, value in ((self.index_node, node), (self.index_type, packet_type),
+                             (self.index_relay, relay), (self.index_event, event_type)):
+            if value is None:
+                continue
+            if not isinstance(value, (list, tuple, set, frozenset)):
+                value = (value,)
+            if not any(packet_id in index.get(v, ()) for v in value):
+                return False
+        return not text or self.packet_contains(packet_id, text.lower())
+
+    def set_retransmission_time(self, stats, timestamp):
+        """Запоминает время ретрансляции и обновляет счетчики задержки"""
+        if not stats['retransmission_time']:
+            self.retransmitted_count += 1
+        stats['retransmission_time'] = timestamp
+
+        if stats['delay_seconds']:
+            self.delay_sum -= stats['delay_seconds']
+            self.delay_count -= 1
+        delay = time_difference(stats['first_seen'], timestamp)
+        stats['delay_seconds'] = delay
+        if delay:
+            self.delay_sum += delay
+            self.delay_count += 1
+
+    def take_changed_packets(self):
+        """Возвращает ID пакетов, изменившихся с прошлого вызова, и сбрасывает список"""
+        changed = self.changed_packets
+        self.changed_packets = {}
+        return list(changed)
 
     def get_packet_summary(self, packet_id):
         """Возвращает сводку по пакету"""
@@ -586,28 +2901,14 @@ class LogParser:
 
         #for event in events:
         #    if event['event_type'] in ['RECEIVED_TEXT', 'RX', 'WEBSERVER']:
-        if len(events)>0:
-            first_rx = events[0]['timestamp']
+        first_rx = self.first_received(packet_id)
         #        break
 
 
         retransmission_time = stats.get('retransmission_time')
 
-        # Вычисляем задержку
-        delay = None
-        if first_rx and retransmission_time:
-            # Преобразуем время в секунды
-            try:
-                t1 = datetime.strptime(first_rx.split()[0], "%H:%M:%S")
-                t2 = datetime.strptime(retransmission_time.split()[0], "%H:%M:%S")
-                delay_seconds = (t2 - t1).seconds
-
-                delay = delay_seconds
-            except:
-                delay = None
-
-
-
+        # Задержка считается в parse_line при каждом START_TX
+        delay = stats.get('delay_seconds')
 
         summary = {
             'packet_id': packet_id,
@@ -626,6 +2927,11 @@ class LogParser:
 
         return summary
 
+    def first_received(self, packet_id):
+        """Время первого события пакета (по нему сортируется таблица)"""
+        events = self.messages.get(packet_id)
+        return events[0].timestamp if events else None
+
     def get_all_packet_summaries(self):
         """Возвращает сводки по всем пакетам"""
         summaries = []
@@ -638,41 +2944,516 @@ class LogParser:
         summaries.sort(key=lambda x: x['first_received'] if x['first_received'] else '')
         return summaries
 
+    def merge(self, other):
+        """
+        Добавляет состояние парсера, разобравшего следующий по времени кусок лога.
+        События пакета, начатого в предыдущих кусках, дописываются в конец
+        """
+        self.busy_rx_count += other.busy_rx_count
+        self.rx_count += other.rx_count
+        self.errors_count += other.errors_count
+        self.nodes |= other.nodes
+        self.evicted_packets += other.evicted_packets
+        self.evicted_events += other.evicted_events
+        # START_TX пакета, принятого в предыдущих кусках, до первого RX в этом куске -
+        # ретрансляция, но кусок об этом приеме не знал
+        if other.collect_metrics:
+            for packet_id in other.packet_stats.keys() & self.packet_stats.keys():
+                if not self.packet_stats[packet_id]['rx_count']:
+                    continue
+                for event in other.messages[packet_id]:
+                    if event.event_type == 'RX':
+                        break
+                    if event.event_type == 'START_TX':
+                        other.metrics.add_channel_early(event.timestamp, CH_RETRANSMIT)
+        shift = self.metrics.merge(other.metrics)
+        if self.text_index is not None:
+            if other.text_index is not None:
+                self.text_index.merge(other.text_index)
+            else:
+                # Кусок разобран без индекса строк - индексируем его события здесь
+                self.text_index.merge(other.build_text_index())
+            self.text_index.compact(len(self.packet_stats) + len(other.packet_stats))
+        if other.last_traceroute_event is not None:
+            self.last_traceroute_event = other.last_traceroute_event
+
+        for packet_id, seconds in other.packet_order:
+            other_stats = other.packet_stats[packet_id]
+            events = other.messages[packet_id]
+            for event in events:
+                self.memory_estimate += EVENT_MEMORY_ESTIMATE + len(event.raw_line)
+            retransmission_time = other_stats['retransmission_time']
+
+            stats = self.packet_stats.get(packet_id)
+            if stats is None:
+                # Счетчики задержки пересчитает set_retransmission_time
+                other_stats['retransmission_time'] = None
+                other_stats['delay_seconds'] = None
+                self.messages[packet_id] = events
+                self.packet_stats[packet_id] = stats = other_stats
+                self.packet_order.append((packet_id, seconds + shift if seconds is not None else None))
+                if self.indexed:
+                    self.index_new_packet(packet_id, other_stats['first_seen'],
+                                          other_stats['from_node'], other_stats['to_node'])
+            else:
+                self.messages[packet_id].extend(events)
+                stats['last_seen'] = other_stats['last_seen']
+                if stats['packet_type'] is None:
+                    stats['packet_type'] = other_stats['packet_type']
+                stats['received_times'].extend(other_stats['received_times'])
+                stats['duplicate_count'] += other_stats['duplicate_count']
+                stats['relays'].extend(other_stats['relays'])
+                # В другом куске этот пакет считался новым, а его первая копия - не дубликатом
+                self.metrics.remove_packet(other_stats['from_node'])
+                if other_stats['rx_count'] and stats['rx_count']:
+                    self.metrics.mark_duplicate(next(e for e in events if e.event_type == 'RX'))
+                stats['rx_count'] += other_stats['rx_count']
+            if self.indexed:
+                self.index_packet_details(packet_id, stats['packet_type'], other_stats['relays'], events)
+
+            if retransmission_time:
+                self.set_retransmission_time(stats, retransmission_time)
+            if self.track_changes:
+                self.changed_packets[packet_id] = None
+
+        self.enforce_retention()
+
+    def get_state(self, line_numbers=None):
+        """
+        Состояние разбора простыми списками и словарями (для кэша разобранного файла
+        в JSON). Индексы query() и индекс строк не сохраняются - их строит первый запрос.
+        line_numbers - строка лога -> ее номер в файле: найденные строки сохраняются номером
+        """
+        packets = []
+        for packet_id, order_time in self.packet_order:
+            stats = dict(self.packet_stats[packet_id])
+            events = []
+            for event in stats.pop('events'):
+                event_state = event.get_state()
+                if line_numbers:
+                    event_state[15] = line_numbers.get(event_state[15], event_state[15])
+                events.append(event_state)
+            packets.append([packet_id, order_time, stats, events])
+        traceroute = None
+        event = self.last_traceroute_event
+        if event is not None and event in self.messages.get(event.packet_id, ()):
+            traceroute = [event.packet_id, self.messages[event.packet_id].index(event)]
+        return {
+            'packets': packets,
+            'nodes': list(self.nodes),
+            'counters': [self.busy_rx_count, self.rx_count, self.errors_count,
+                         self.retransmitted_count, self.delay_sum, self.delay_count,
+                         self.memory_estimate, self.evicted_packets, self.evicted_events],
+            'traceroute': traceroute,
+            'metrics': self.metrics.get_state()
+        }
+
+    @classmethod
+    def from_state(cls, state, lines=None):
+        """
+        Парсер из get_state(); настройки и ограничения хранения задает вызывающий.
+        lines - строки файла лога, если строки событий сохранены номерами
+        """
+        parser = cls()
+        strings = {}
+        share = strings.setdefault
+        for packet_id, order_time, stats, events in state['packets']:
+            packet_id = share(packet_id, packet_id)
+            events = [LogEvent.from_state(event, strings, lines) for event in events]
+            stats['from_node'] = share(stats['from_node'], stats['from_node'])
+            stats['to_node'] = share(stats['to_node'], stats['to_node'])
+            stats['relays'] = [share(relay, relay) for relay in stats['relays']]
+            stats['events'] = events
+            parser.messages[packet_id] = events
+            parser.packet_stats[packet_id] = stats
+            parser.packet_order.append((packet_id, order_time))
+        parser.nodes = set(state['nodes'])
+        (parser.busy_rx_count, parser.rx_count, parser.errors_count,
+         parser.retransmitted_count, parser.delay_sum, parser.delay_count,
+         parser.memory_estimate, parser.evicted_packets, parser.evicted_events) = state['counters']
+        if state['traceroute'] is not None:
+            packet_id, position = state['traceroute']
+            parser.last_traceroute_event = parser.messages[packet_id][position]
+        parser.metrics = MetricsAggregator.from_state(state['metrics'])
+        return parser
+
+    def build_text_index(self):
+        """Строит индекс строк по уже разобранным событиям"""
+        self.text_index = TextIndex()
+        for count, (packet_id, events) in enumerate(self.messages.items(), 1):
+            for event in events:
+                self.text_index.add(packet_id, event.raw_line)
+            if count % 1024 == 0:
+                self.text_index.compact(count)
+        self.text_index.compact(len(self.messages))
+        return self.text_index
+
+    def get_export_data(self):
+        """Возвращает статистику, сводки пакетов и узлы для экспорта, с collect_metrics - и метрики"""
+        data = {
+            'statistics': self.get_statistics(),
+            'packets': self.get_all_packet_summaries(),
+            'nodes': list(self.nodes)
+        }
+        if self.collect_metrics:
+            data['channel_metrics'] = self.metrics.get_channel_metrics()
+            data['node_metrics'] = self.metrics.get_node_metrics()
+            data['relay_metrics'] = self.metrics.get_relay_metrics()
+        return data
+
     def get_statistics(self):
         """Возвращает общую статистику"""
         total_packets = len(self.packet_stats)
-        retransmitted = sum(1 for s in self.packet_stats.values() if s.get('retransmission_time'))
-
-        # Средняя задержка ретрансляции
-        delays = []
-        for packet_id in self.packet_stats:
-            summary = self.get_packet_summary(packet_id)
-            if summary and summary['delay_seconds']:
-                delays.append(summary['delay_seconds'])
 
-        avg_delay = sum(delays) / len(delays) if delays else 0
+        # Средняя задержка ретрансляции (ненулевые задержки)
+        avg_delay = self.delay_sum / self.delay_count if self.delay_count else 0
 
         stats = {
             'total_packets': total_packets,
-            'retransmitted_packets': retransmitted,
+            'retransmitted_packets': self.retransmitted_count,
             'unique_nodes': len(self.nodes),
             'busy_rx_count': self.busy_rx_count,
             'rx_count': self.rx_count,
             'errors_count': self.errors_count,
+            'evicted_packets': self.evicted_packets,
+            'evicted_events': self.evicted_events,
             'avg_retransmission_delay': avg_delay,
             'uptime_seconds': time.time() - self.start_time
         }
 
         return stats
 
+# Размер куска файла для параллельного разбора, байт
+SHARD_SIZE = 16 * 1024 * 1024
+
+
+def split_log_file(filename, shard_size=SHARD_SIZE):
+    """Делит файл на куски примерно по shard_size байт по границам строк"""
+    size = os.path.getsize(filename)
+    bounds = [0]
+    with open(filename, 'rb') as f:
+        while bounds[-1] + shard_size < size:
+            f.seek(bounds[-1] + shard_size)
+            f.readline()
+            if f.tell() >= size:
+                break
+            bounds.append(f.tell())
+    bounds.append(size)
+    return [(filename, bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+
+
+def parse_log_shard(shard):
+    """Разбирает кусок файла в отдельном процессе, возвращает (парсер, строк, байт)"""
+    filename, start, end, settings = shard
+    parser = LogParser()
+    parser.apply_settings(settings)
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    lines_count = 0
+    with gc_paused():
+        for line in data.decode('utf-8', errors='ignore').splitlines():
+            parser.parse_line(line.strip())
+            lines_count += 1
+    return parser, lines_count, end - start
+
+
+def parse_shards_parallel(parser, filenames, workers=None, shard_size=SHARD_SIZE):
+    """
+    Разбирает файлы кусками в пуле процессов с настройками parser.
+    Отдает (парсер куска, строк, байт) в порядке файлов, для слияния через parser.merge.
+    Traceroute, разрезанный границей куска, теряет строку маршрута
+    """
+    settings = parser.get_settings()
+    shards = [shard + (settings,)
+              for filename in filenames
+              for shard in split_log_file(filename, shard_size)]
+    import multiprocessing
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap(parse_log_shard, shards)
+
+
+def parse_files_parallel(parser, filenames, workers=None, shard_size=SHARD_SIZE):
+    """Разбирает файлы в пуле процессов и сливает результат в parser, возвращает число строк"""
+    lines_count = 0
+    for partial, lines, _ in parse_shards_parallel(parser, filenames, workers, shard_size):
+        parser.merge(partial)
+        lines_count += lines
+    return lines_count
+
+
+class ParallelFileLoader(FileLoader):
+    """Фоновая загрузка нескольких файлов с разбором в пуле процессов"""
+    def __init__(self, filenames, parser, workers=None):
+        super().__init__(filenames[0], parser)
+        self.filenames = list(filenames)
+        self.workers = workers
+        if len(self.filenames) > 1:
+            self.name = f"{len(self.filenames)} файлов"
+
+    def start(self):
+        try:
+            self.total_bytes = sum(os.path.getsize(filename) for filename in self.filenames)
+        except OSError as e:
+            self.error = e
+            return False
+        self.start_time = time.time()
+        self.running = True
+        thread = threading.Thread(target=self._read_file)
+        thread.daemon = True
+        thread.start()
+        return True
+
+    def _read_file(self):
+        try:
+            shards = parse_shards_parallel(self.parser, self.filenames, self.workers)
+            for partial, lines, nbytes in shards:
+                if not self.running:
+                    shards.close()
+                    break
+                self.prepare_result(partial)
+                self.lines_read += lines
+                self.bytes_read += nbytes
+        except Exception as e:
+            self.error = e
+        self.end_time = time.time()
+        self.running = False
+        self.finished = True
+
+
+def format_packet_row(summary, node_names, relayinfo):
+    """Значения колонок таблицы пакетов для сводки пакета"""
+    delay_str = f"{summary['delay_seconds']:.0f}" if summary['delay_seconds']!=None else "N/A"
+    relays = [relayinfo.get(x, x) for x in summary['relays']]
+    name = node_names.get
+    return (
+        f"0x{summary['packet_id']}",
+        #summary['message'],
+        name(summary['from_node']),
+        name(summary['to_node']),
+        summary['packet_type'],
+        summary['first_received'] or 'N/A',
+        summary['retransmission_time'] or 'N/A',
+        delay_str,
+        summary['duplicate_count'],
+        relays,
+        summary['event_count']
+    )
+
+
+class PacketTable:
+    """
+    Виртуальная таблица пакетов без привязки к Tk: в tree (ttk.Treeview или
+    HeadlessWidget) только видимые строки, содержимое берется из упорядоченного
+    списка ID пакетов при прокрутке. scroll - скроллбар, label - счетчик найденного.
+    Тот же код обновляет таблицу в GUI и в замерах (run_benchmark)
+    """
+    # Запас строк выше и ниже видимых, для которых значения колонок остаются в кэше
+    OVERSCAN = 30
+
+    def __init__(self, tree, scroll, label, row_values, height=15):
+        self.tree = tree
+        self.scroll = scroll
+        self.label = label
+        self.make_row_values = row_values  # Сводка пакета -> значения колонок
+        self.height = height
+        self.parser = None  # Парсер, по которому построена таблица
+        self.ids = []  # ID пакетов в порядке таблицы
+        self.keys = []  # Время первого приёма тех же пакетов, для bisect
+        self.packet_keys = {}  # ID пакета -> время первого приёма
+        self.top = 0  # Индекс первой видимой строки
+        self.items = []  # Строки tree сверху вниз
+        self.shown = []  # (ID пакета, значения) в строках tree
+        self.row_cache = {}  # ID пакета -> значения колонок видимых строк и запаса вокруг них
+        self.selected_packet_id = None
+        self.filter = {}  # Фильтры query() для таблицы, пусто - все пакеты
+
+    def insert(self, packet_id):
+        """Вставляет пакет в список с сохранением сортировки по времени первого приёма"""
+        key = self.parser.first_received(packet_id) or ''
+        index = bisect.bisect_right(self.keys, key)
+        self.keys.insert(index, key)
+        self.ids.insert(index, packet_id)
+        self.packet_keys[packet_id] = key
+        if index < self.top:
+            self.top += 1  # Видимые строки остаются на месте
+
+    def position(self, packet_id):
+        """Индекс пакета в списке или None"""
+        key = self.packet_keys.get(packet_id)
+        if key is None:
+            return None
+        index = bisect.bisect_left(self.keys, key)
+        while self.ids[index] != packet_id:
+            index += 1
+        return index
+
+    def delete(self, packet_id):
+        """Удаляет пакет из списка"""
+        index = self.position(packet_id)
+        del self.ids[index]
+        del self.keys[index]
+        del self.packet_keys[packet_id]
+        self.row_cache.pop(packet_id, None)
+        if index < self.top:
+            self.top -= 1
+
+    def row_values(self, packet_id):
+        values = self.row_cache.get(packet_id)
+        if values is None:
+            values = self.row_cache[packet_id] = self.make_row_values(self.parser.get_packet_summary(packet_id))
+        return values
+
+    def render(self):
+        """Заполняет строки tree пакетами с top, меняя только изменившиеся строки"""
+        total = len(self.ids)
+        height = min(self.height, total)
+        self.top = max(0, min(self.top, total - height))
+        top = self.top
+
+        # Строк в tree столько, сколько видно
+        while len(self.items) < height:
+            self.items.append(self.tree.insert('', 'end', values=()))
+            self.shown.append(None)
+        while len(self.items) > height:
+            self.tree.delete(self.items.pop())
+            self.shown.pop()
+
+        selected_item = None
+        for row, item_id in enumerate(self.items):
+            packet_id = self.ids[top + row]
+            values = self.row_values(packet_id)
+            if self.shown[row] != (packet_id, values):
+                self.tree.item(item_id, values=values)
+                self.shown[row] = (packet_id, values)
+            if packet_id == self.selected_packet_id:
+                selected_item = item_id
+
+        # Выделение привязано к пакету, а не к строке tree
+        if selected_item:
+            if self.tree.selection() != (selected_item,):
+                self.tree.selection_set(selected_item)
+                self.tree.focus(selected_item)
+        elif self.tree.selection():
+            self.tree.selection_remove(self.tree.selection())
+
+        # Кэш значений только для видимых строк и запаса вокруг них
+        if len(self.row_cache) > height + 2 * self.OVERSCAN:
+            keep = set(self.ids[max(0, top - self.OVERSCAN):top + height + self.OVERSCAN])
+            self.row_cache = {packet_id: values for packet_id, values in self.row_cache.items()
+                              if packet_id in keep}
+
+        if total:
+            self.scroll.set(top / total, (top + height) / total)
+        else:
+            self.scroll.set(0, 1)
+        if self.filter:
+            self.label.config(text=f"Найдено: {total}")
+        else:
+            self.label.config(text="")
+
+    def scroll_by(self, rows):
+        self.top += rows
+        self.render()
+
+    def scroll_command(self, *args):
+        """Команда скроллбара: moveto доля / scroll n units|pages"""
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * len(self.ids))
+        elif args[0] == 'scroll':
+            rows = int(args[1])
+            if args[2] == 'pages':
+                rows *= self.height
+            self.top += rows
+        self.render()
+
+    def move_selection(self, rows):
+        """Перемещает выделение по списку пакетов с прокруткой, возвращает выбранный ID или None"""
+        if not self.ids:
+            return None
+        index = self.position(self.selected_packet_id)
+        if index is None:
+            index = self.top
+        else:
+            index = max(0, min(index + rows, len(self.ids) - 1))
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + self.height:
+            self.top = index - self.height + 1
+        self.selected_packet_id = self.ids[index]
+        self.render()
+        return self.selected_packet_id
+
+    def select_item(self, item_id):
+        """Выбор строки tree; возвращает ID пакета или None, если он уже был выбран"""
+        packet_id = self.shown[self.items.index(item_id)][0]
+        if packet_id == self.selected_packet_id:
+            return None
+        self.selected_packet_id = packet_id
+        return packet_id
+
+    def forget_nodes(self, node_ids):
+        """Сбрасывает значения строк пакетов от узлов и для узлов node_ids и перерисовывает"""
+        # Значения колонок есть только у видимых строк и запаса вокруг них - их и проверяем
+        for packet_id in list(self.row_cache):
+            stats = self.parser.packet_stats.get(packet_id)
+            if stats is None or stats['from_node'] in node_ids or stats['to_node'] in node_ids:
+                del self.row_cache[packet_id]
+        self.render()
+
+    def update(self, parser, autoscroll=True):
+        """Обновляет только пакеты, изменившиеся с прошлого обновления"""
+        if self.parser is not parser:
+            self.rebuild(parser, autoscroll)
+            return
+
+        new_packets = []
+        for packet_id in parser.take_changed_packets():
+            self.row_cache.pop(packet_id, None)
+            matches = (packet_id in parser.packet_stats and
+                       (not self.filter or parser.packet_matches(packet_id, **self.filter)))
+            if packet_id in self.packet_keys:
+                # Пакет вытеснен ограничением хранения (или вытеснен и начат заново)
+                if not matches or self.packet_keys[packet_id] != (parser.first_received(packet_id) or ''):
+                    self.delete(packet_id)
+            if matches and packet_id not in self.packet_keys:
+                new_packets.append(packet_id)
+
+        new_packets.sort(key=lambda packet_id: parser.first_received(packet_id) or '')
+        for packet_id in new_packets:
+            self.insert(packet_id)
+
+        # Автоскролл в конец
+        if autoscroll:
+            self.top = len(self.ids)
+        self.render()
+
+    def rebuild(self, parser, autoscroll=True):
+        """Полностью перестраивает таблицу по parser"""
+        self.parser = parser
+        parser.take_changed_packets()
+        self.row_cache = {}
+        self.shown = [None] * len(self.items)
+
+        # query() отдает пакеты из индекса времени, уже упорядоченные
+        self.ids = parser.query(**self.filter)
+        self.keys = [parser.first_received(packet_id) or '' for packet_id in self.ids]
+        self.packet_keys = dict(zip(self.ids, self.keys))
+
+        # Автоскролл в конец
+        if autoscroll:
+            self.top = len(self.ids)
+        self.render()
+
+
 class LogAnalyzerGUI:
     def __init__(self):
+        import_tk()
         self.root = tk.Tk()
         self.root.title("Meshtastic Node Log Analyzer")
         self.root.geometry("1400x900")
 
         # Инициализация компонентов
-        self.parser = LogParser()
         self.serial_reader = None
         self.autoscroll = tk.BooleanVar(value=True)
         self.show_username = tk.BooleanVar(value=True)
@@ -682,15 +3463,23 @@ class LogAnalyzerGUI:
         self.time_correction = tk.BooleanVar(value=True)
         self.writelog = tk.BooleanVar(value=True)
         self.display_mode = tk.StringVar(value="combine") 
+        self.max_packets = tk.IntVar(value=0)  # 0 - хранить все пакеты
+        self.use_index = tk.BooleanVar(value=False)
         self.current_packet_details_id = None
         self.udp_receiver = None
+        self.file_follower = None
+        self.ingest_engine = None
+        self.file_loader = None
+        self.metrics_window = None
+        self.diagnostics = PipelineDiagnostics()
+        self.diagnostics_window = None
+        self.nodeinfo_fetcher = None
+        self.parser = self.new_parser()
 
-        nodesfile = 'nodeinfo.json'
-        if os.path.exists(nodesfile):
-            with open(nodesfile, 'r', encoding='utf-8') as f:
-                self.nodeinfo = json.load(f)
-        else:
-            self.nodeinfo = {}
+        # nodeinfo.json читается в фоне, пока строится окно; до того таблица показывает ID
+        self.nodeinfo = {}
+        self.node_names = NodeNames(self.nodeinfo, self.display_mode.get())
+        self.start_nodeinfo_loading()
 
 
         self.update_relayinfo()
@@ -702,6 +3491,9 @@ class LogAnalyzerGUI:
 
         self.create_status_bar()
 
+        self.init_seconds = time.perf_counter() - STARTUP_BEGIN
+        self.root.bind('<Map>', self.report_startup)
+
 
         self.show_connection_dialog()
 
@@ -713,39 +3505,113 @@ class LogAnalyzerGUI:
         # Запуск обновления GUI
         self.update_gui()
 
-    def update_nodeinfo(self):
-        iface = SerialInterface(devPath=self.selected_port)
-        if iface.nodes:
-            self.nodeinfo = iface.nodes.copy()
-            with open('nodeinfo.json', 'w', encoding='utf-8') as f:
-                json.dump(self.nodeinfo, f, ensure_ascii=False, indent=2) 
-
-            print(f"Загружено узлов: {str(len(self.nodeinfo))}")
-            iface.close()
-
-    def update_nodeinfo_via_tcp(self, ip_address, port=4403):
-        """Получает nodeinfo через TCP интерфейс Meshtastic"""
-        try:
-            # Подключаемся через TCP интерфейс
-            iface = TCPInterface(hostname=ip_address, portNumber=port, timeout=3)
+    def new_parser(self):
+        """Создает парсер с текущими настройками GUI"""
+        parser = LogParser()
+        parser.track_changes = True
+        parser.collect_metrics = True
+        parser.indexed = True  # Таблица и фильтры сразу работают по индексам
+        parser.time_correction = self.time_correction.get()
+        parser.filter_webserver = self.filter_webserver.get()
+        parser.max_packets = self.max_packets.get() or None
+        return parser
+
+    def start_nodeinfo_loading(self):
+        """Запускает чтение nodeinfo.json в фоновом потоке"""
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(nodeinfo=load_nodeinfo()), daemon=True)
+        thread.start()
+        self.root.after(50, self.poll_nodeinfo_loading, thread, result)
+
+    def poll_nodeinfo_loading(self, thread, result):
+        """Подставляет прочитанный nodeinfo, когда фоновый поток закончит"""
+        if thread.is_alive():
+            self.root.after(50, self.poll_nodeinfo_loading, thread, result)
+            return
+        nodeinfo = result.get('nodeinfo', {})
+        # Узлы, уже полученные с ноды, свежее файла
+        added = [node_id for node_id in nodeinfo if node_id not in self.nodeinfo]
+        for node_id in added:
+            self.nodeinfo[node_id] = nodeinfo[node_id]
+        self.node_names.update(self.nodeinfo, [node_id.lstrip('!') for node_id in added])
+        if added and hasattr(self, 'tree'):
+            self.rebuild_packets_table()
+
+    def report_startup(self, event):
+        """Время от запуска до появления главного окна - в консоль, статус бар и диагностику"""
+        if event.widget is not self.root:
+            return
+        self.root.unbind('<Map>')
+        window_seconds = time.perf_counter() - STARTUP_BEGIN
+        self.diagnostics.startup = {
+            'init_seconds': round(self.init_seconds, 3),
+            'window_seconds': round(window_seconds, 3)
+        }
+        print(f"Запуск: окно через {window_seconds:.2f}с (импорт и создание виджетов {self.init_seconds:.2f}с)")
+        self.update_status(f"Запуск за {window_seconds:.2f}с")
 
-            # Получаем информацию об узлах
-            if iface.nodes:
-                self.nodeinfo = iface.nodes.copy()
-                with open('nodeinfo.json', 'w', encoding='utf-8') as f:
-                    json.dump(self.nodeinfo, f, ensure_ascii=False, indent=2)
+    def update_nodeinfo(self, on_done=None):
+        """Загружает nodeinfo с ноды по последовательному порту в фоне"""
+        return self.start_nodeinfo_fetch(NodeinfoFetcher(dev_path=self.selected_port), on_done)
 
-                print(f"Загружено узлов через TCP: {len(self.nodeinfo)}")
-                iface.close()
-                return True
-            else:
-                print("Не удалось получить информацию об узлах")
-                iface.close()
-                return False
+    def update_nodeinfo_via_tcp(self, ip_address, port=4403, on_done=None):
+        """Получает nodeinfo через TCP интерфейс Meshtastic в фоне"""
+        return self.start_nodeinfo_fetch(NodeinfoFetcher(hostname=ip_address, port=port), on_done)
 
-        except Exception as e:
-            print(f"Ошибка подключения к {ip_address}:{port} - {e}")
+    def start_nodeinfo_fetch(self, fetcher, on_done=None):
+        """
+        Запускает фоновую загрузку nodeinfo. on_done(success) вызывается в потоке GUI
+        после слияния и сохранения. False - уже идет другая загрузка
+        """
+        if self.nodeinfo_fetcher:
+            messagebox.showwarning("Nodeinfo", f"Уже идет загрузка nodeinfo с {self.nodeinfo_fetcher.name}")
             return False
+        self.nodeinfo_fetcher = fetcher
+        fetcher.start()
+        self.update_status(f"Nodeinfo: подключение к {fetcher.name}")
+        self.root.after(200, self.poll_nodeinfo_fetch, fetcher, on_done)
+        return True
+
+    def poll_nodeinfo_fetch(self, fetcher, on_done):
+        """Показывает прогресс загрузки nodeinfo, по окончании вливает узлы и сохраняет файл"""
+        progress = fetcher.get_progress()
+        if not fetcher.finished:
+            self.update_status(f"Nodeinfo с {fetcher.name}: {progress['stage']}, "
+                               f"узлов {progress['nodes']} ({progress['elapsed']:.0f}с)")
+            self.root.after(200, self.poll_nodeinfo_fetch, fetcher, on_done)
+            return
+
+        self.nodeinfo_fetcher = None
+        success = bool(fetcher.nodes)
+        if success:
+            # Узлы, которых нет в ответе ноды, остаются из прежнего nodeinfo
+            changed, renamed = merge_nodeinfo(self.nodeinfo, fetcher.nodes)
+            self.node_names.update(self.nodeinfo, renamed)
+            if changed:
+                try:
+                    save_nodeinfo(self.nodeinfo)
+                except Exception as e:
+                    print(f"Ошибка сохранения {NODEINFO_FILE}: {e}")
+            self.refresh_node_rows(renamed)
+            print(f"Загружено узлов: {len(fetcher.nodes)}, изменилось: {len(changed)}")
+            self.update_status(f"Nodeinfo с {fetcher.name}: узлов {len(fetcher.nodes)}, "
+                               f"изменилось {len(changed)}, новых имен {len(renamed)}")
+        elif fetcher.error:
+            self.update_status(f"Ошибка загрузки nodeinfo с {fetcher.name}: {fetcher.error}")
+        else:
+            print("Не удалось получить информацию об узлах")
+            self.update_status(f"Nodeinfo с {fetcher.name}: узлов не получено")
+        if on_done:
+            on_done(success)
+
+    def refresh_node_rows(self, node_ids):
+        """Перерисовывает только строки пакетов от узлов и для узлов с новыми именами"""
+        if not node_ids or not hasattr(self, 'tree'):
+            return
+        # Таблица другого парсера все равно перестроится при обновлении
+        if self.table.parser is self.parser:
+            self.table.forget_nodes(set(node_ids))
+        self.details_update()
 
     def show_tcp_connection_dialog(self):
         """Показывает диалог для ввода IP адреса ноды"""
@@ -776,14 +3642,19 @@ class LogAnalyzerGUI:
 
             try:
                 port = int(port_var.get())
-                if self.update_nodeinfo_via_tcp(ip, port):
+            except ValueError:
+                messagebox.showerror("Ошибка", "Неверный номер порта")
+                return
+
+            def on_done(success):
+                if success:
                     messagebox.showinfo("Успех", f"Nodeinfo загружен с {ip}:{port}")
-                    dialog.destroy()
-                    self.update_packets_table()
                 else:
                     messagebox.showerror("Ошибка", f"Не удалось загрузить nodeinfo с {ip}:{port}")
-            except ValueError:
-                messagebox.showerror("Ошибка", "Неверный номер порта")
+
+            # Загрузка идет в фоне, прогресс - в статус баре
+            if self.update_nodeinfo_via_tcp(ip, port, on_done=on_done):
+                dialog.destroy()
 
         def on_cancel():
             dialog.destroy()
@@ -801,11 +3672,7 @@ class LogAnalyzerGUI:
         """Показывает диалог выбора источника данных"""
         dialog = ConnectionDialog(self.root)
         result = dialog.show()
-        if self.udp_receiver:
-            try:
-                self.udp_receiver.stop()
-            except:
-                pass
+        self.stop_live_sources()
         if not result:
             self.connection_established = False
             return False
@@ -816,11 +3683,13 @@ class LogAnalyzerGUI:
             # Создаем SerialReader с выбранным портом
             self.selected_port = self.connection_param
             answer = messagebox.askyesno("Nodeinfo", "Обновить Nodeinfo?")
+            self.serial_reader = SerialReader(port=self.connection_param)
+            fetching = False
             if answer:
                 print('Загружаем информацию об узлах')
-                self.update_nodeinfo()
-            self.serial_reader = SerialReader(port=self.connection_param)
-            if not self.start_serial_reading():
+                # Порт занят загрузкой nodeinfo - чтение лога начнется, когда она закончится
+                fetching = self.update_nodeinfo(on_done=self.start_serial_after_nodeinfo)
+            if not fetching and not self.start_serial_reading():
                 self.show_connection_dialog()
             self.connection_established = True        
         elif self.connection_type == 'udp':
@@ -832,13 +3701,37 @@ class LogAnalyzerGUI:
             if not self.start_udp_reading():
                 self.show_connection_dialog()
             self.connection_established = True                    
+        elif self.connection_type == 'follow':
+            # Следим за дописываемым файлом, суточный лог - с переходом на новый после полуночи
+            filename = self.connection_param
+            if os.path.abspath(filename) == os.path.abspath(log_writer.daily_filename()):
+                self.file_follower = FileFollower(directory=os.path.dirname(filename))
+            else:
+                self.file_follower = FileFollower(filename)
+            if not self.start_file_following():
+                self.show_connection_dialog()
+            self.connection_established = True
+        elif self.connection_type == 'multi':
+            # Несколько источников в одном цикле asyncio
+            sources = self.connection_param
+            if all(kind == 'udp' for kind, param in sources):
+                self.time_correction.set(False)
+                self.parser.time_correction = False
+            self.ingest_engine = IngestEngine(sources)
+            self.ingest_engine.to_file = self.writelog.get()
+            if not self.start_ingest():
+                self.show_connection_dialog()
+            self.connection_established = True
         else:  # file
             # Загружаем данные из файла
             self.connection_established = True                
             self.load_from_file(self.connection_param)
-            self.update_statistics()
             
 
+    def start_serial_after_nodeinfo(self, success):
+        if not self.start_serial_reading():
+            self.show_connection_dialog()
+
     def start_udp_reading(self):
         """Запускает чтение из UDP порта"""
         if self.udp_receiver.start():
@@ -851,27 +3744,82 @@ class LogAnalyzerGUI:
             self.update_status("Ошибка подключения к UDP порту")
             return False
 
-    def load_from_file(self, filename):
-        """Загружает данные из файла лога"""
-        try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            self.update_status(f"Загрузка файла: {os.path.basename(filename)}")
-            
-            # Парсим все строки
-            for line in lines:
-                self.parser.parse_line(line.strip())
-            
-            self.update_status(f"Файл загружен: {len(lines)} строк")
-            self.serial_indicator.config(text="📁 Файл")
+    def start_file_following(self):
+        """Запускает слежение за файлом лога"""
+        if self.file_follower.start():
+            self.serial_running = True  # Переиспользуем флаг
+            self.serial_indicator.config(text=f"👁 {self.file_follower.name}")
+            self.update_status(f"Слежение за файлом: {self.file_follower.filename}")
             return True
-            
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка загрузки файла: {e}")
+        else:
+            self.serial_indicator.config(text="🔴 Ошибка файла")
+            self.update_status("Ошибка открытия файла")
             return False
-            
 
+    def start_ingest(self):
+        """Запускает прием из нескольких источников"""
+        if self.ingest_engine.start():
+            self.serial_running = True  # Переиспользуем флаг
+            self.serial_indicator.config(text=f"🟢 Источников: {len(self.ingest_engine.sources)}")
+            self.update_status("Источники подключены")
+            return True
+        else:
+            self.serial_indicator.config(text="🔴 Ошибка")
+            self.update_status("Ошибка запуска источников")
+            return False
+
+    def load_from_file(self, filename):
+        """Загружает данные из файла лога в фоновом потоке"""
+        return self.start_file_loader(FileLoader(filename, self.parser, use_index=self.use_index.get()))
+
+    def load_from_files_parallel(self, filenames):
+        """Загружает файлы логов, разбирая их в нескольких процессах"""
+        return self.start_file_loader(ParallelFileLoader(filenames, self.parser))
+
+    def start_file_loader(self, loader):
+        self.cancel_file_loading()
+        self.file_loader = loader
+        if not self.file_loader.start():
+            messagebox.showerror("Ошибка", f"Ошибка загрузки файла: {self.file_loader.error}")
+            self.file_loader = None
+            return False
+
+        self.update_status(f"Загрузка файла: {loader.name}")
+        self.serial_indicator.config(text="📁 Загрузка")
+        self.root.after(200, self.poll_file_loader, self.file_loader)
+        return True
+
+    def poll_file_loader(self, loader):
+        """Показывает прогресс загрузки файла в статус баре"""
+        if loader is not self.file_loader:
+            return
+        # Слияние - здесь, в потоке Tk: self.parser читают и пишут только из него
+        loader.merge_results()
+        progress = loader.get_progress()
+        speed = f"{progress['bytes_per_sec'] / 1048576:.1f} МБ/с, {progress['lines_per_sec']:.0f} строк/с"
+
+        if not loader.finished or not loader.results.empty():
+            self.update_status(f"Загрузка файла: {loader.name} "
+                               f"{progress['percent']:.0f}% ({speed})")
+            self.root.after(200, self.poll_file_loader, loader)
+            return
+
+        self.file_loader = None
+        if loader.error:
+            self.update_status("Ошибка загрузки файла")
+            messagebox.showerror("Ошибка", f"Ошибка загрузки файла: {loader.error}")
+        elif loader.bytes_read < loader.total_bytes:
+            self.update_status(f"Загрузка отменена: {progress['lines_read']} строк")
+        else:
+            self.update_status(f"Файл загружен: {progress['lines_read']} строк "
+                               f"за {progress['elapsed']:.1f}с ({speed})")
+        self.serial_indicator.config(text="📁 Файл")
+        self.update_statistics()
+
+    def cancel_file_loading(self):
+        """Отменяет фоновую загрузку файла"""
+        if self.file_loader:
+            self.file_loader.stop()
 
     def create_status_bar(self):
         """Создает статус бар внизу окна"""
@@ -899,7 +3847,9 @@ class LogAnalyzerGUI:
             ('errors', '  Ошибок: 0'),
             ('nodes', '📡 Узлы: 0'),
             ('busy', '⚠️ BusyRx: 0'),
-            ('delay', '⏱️ Задержка: 0.0с')
+            ('delay', '⏱️ Задержка: 0.0с'),
+            ('evicted', '🗑 Вытеснено: 0'),
+            ('channel', '📶 Канал 1м: -')
         ]
         
         for key, default_text in stats_items:
@@ -932,8 +3882,13 @@ class LogAnalyzerGUI:
         file_menu.add_command(label="Источник данных", 
                             command=self.show_connection_dialog,
                             accelerator="Ctrl+O")
+        file_menu.add_command(label="Загрузить файлы логов (параллельно)...", 
+                            command=self.open_log_files_parallel)
         #file_menu.add_command(label="Подключиться к порту...", 
         #                    command=self.reconnect_serial)
+        file_menu.add_command(label="Отменить загрузку файла", 
+                            command=self.cancel_file_loading,
+                            accelerator="Esc")
         file_menu.add_separator()
         file_menu.add_command(label="Экспорт в JSON", 
                             command=self.export_json, 
@@ -986,6 +3941,18 @@ class LogAnalyzerGUI:
                                   variable= self.writelog,
                                   command= self.toggle_writelog
                                   )
+
+        view_menu.add_checkbutton(label="Кэш разобранных файлов",
+                                  variable=self.use_index)
+
+        retention_menu = Menu(view_menu, tearoff=0)
+        view_menu.add_cascade(label="Хранить пакетов", menu=retention_menu)
+        for label, value in (("Все", 0), ("10 000", 10000), ("50 000", 50000),
+                             ("100 000", 100000), ("500 000", 500000)):
+            retention_menu.add_radiobutton(label=label,
+                                           variable=self.max_packets,
+                                           value=value,
+                                           command=self.update_retention)
         view_menu.add_separator()
         
         # Меню Сервис
@@ -999,6 +3966,10 @@ class LogAnalyzerGUI:
 
         tools_menu.add_command(label="Перезагрузить relayinfo", 
                              command=self.update_relayinfo)
+        tools_menu.add_command(label="Метрики узлов, релеев и канала", 
+                             command=self.show_metrics_window)
+        tools_menu.add_command(label="Диагностика конвейера",
+                             command=self.show_diagnostics_window)
         tools_menu.add_separator()
         tools_menu.add_command(label="Очистить данные", 
                             command=self.clear_data, 
@@ -1016,55 +3987,61 @@ class LogAnalyzerGUI:
         self.root.bind('<F5>', lambda e: self.update_statistics())
         self.root.bind('<Control-e>', lambda e: self.export_json())
         self.root.bind('<Control-d>', lambda e: self.clear_data())
+        self.root.bind('<Escape>', lambda e: self.cancel_file_loading())
 
 
+    def stop_live_sources(self):
+        """Останавливает все живые источники: порт, UDP, слежение за файлом, несколько источников"""
+        if self.serial_reader:
+            self.serial_reader.stop()
+            self.serial_reader = None
+        if self.udp_receiver:
+            try:
+                self.udp_receiver.stop()
+            except:
+                pass
+            self.udp_receiver = None
+        if self.file_follower:
+            self.file_follower.stop()
+            self.file_follower = None
+        if self.ingest_engine:
+            self.ingest_engine.stop()
+            self.ingest_engine = None
+        self.serial_running = False
+
     def open_log_file(self):
         """Открывает диалог выбора файла лога"""
-        if self.serial_running:
-            self.serial_reader.stop()
-            self.serial_running = False
-        
         filename = filedialog.askopenfilename(
             title="Выберите файл лога",
             filetypes=[("Text files", "*.txt *.log"), ("All files", "*.*")]
         )
         
         if filename:
+            self.stop_live_sources()
             self.clear_data()
             self.load_from_file(filename)
-            self.serial_indicator.config(text="📁 Файл")
     
+    def open_log_files_parallel(self):
+        """Открывает несколько файлов логов (например, за несколько дней) с параллельным разбором"""
+        filenames = filedialog.askopenfilenames(
+            title="Выберите файлы логов",
+            filetypes=[("Text files", "*.txt *.log"), ("All files", "*.*")]
+        )
+
+        if filenames:
+            self.stop_live_sources()
+            self.clear_data()
+            self.load_from_files_parallel(sorted(filenames))
+
     def update_display_mode(self):
         """Обновляет режим отображения имен"""
-        self.update_packets_table()
+        self.node_names.set_mode(self.display_mode.get())
+        self.rebuild_packets_table()
     
     def get_display_name(self, node_id, mode=None):
         """Возвращает отображаемое имя узла в зависимости от режима"""
-        if mode is None:
-            mode = self.display_mode.get()
-        if node_id==None:
-            return "N/A"    
-        node_id = "!"+node_id               
-        # Авторежим: если есть файл nodes.txt - по имени, иначе по ID
-        if mode ==  "combine":
-            if not self.nodeinfo or node_id not in self.nodeinfo:
-                return node_id[5:]
-            return f'{self.nodeinfo[node_id]["user"]["longName"]} ({self.nodeinfo[node_id]["user"]["shortName"]})'
-        elif mode == "longname":
-            if node_id in self.nodeinfo:
-                return self.nodeinfo[node_id]["user"]["longName"]
-            return node_id[5:]
-
-        elif mode == "id":
-            return node_id[5:]
-
-        elif mode == "shortname":
-            if node_id in self.nodeinfo:
-                return self.nodeinfo[node_id]["user"]["shortName"]
-            return node_id[5:]
-        
-        return node_id[5:]
-    
+        return self.node_names.get(node_id, mode)
+
     def decrypt_route_string(self,route_str):
         """
         Расшифровывает строку маршрута, заменяя node_id на отображаемые имена.
@@ -1076,21 +4053,7 @@ class LogAnalyzerGUI:
         Returns:
             str: Расшифрованная строка с именами устройств
         """
-
-        def replace_node_id(match):
-            """Вспомогательная функция для замены node_id в re.sub"""
-            hex_str = match.group(1)  # Извлекаем hex без '0x'
-            node_id = hex_str.zfill(8)  # Добиваем нулями до 8 символов
-            display_name = self.get_display_name(node_id)
-            return display_name
-    
-        # Шаблон для поиска всех node_id в формате 0xXXXXXX
-        pattern = r'0x([a-fA-F0-9]+)'
-    
-        # Заменяем все вхождения node_id на отображаемые имена
-        result = re.sub(pattern, replace_node_id, route_str)
-
-        return result    
+        return self.node_names.route(route_str)
 
     def create_menu_old(self):
         """Создает меню приложения"""
@@ -1138,6 +4101,8 @@ class LogAnalyzerGUI:
         relaysfile = 'relays.txt'
         if os.path.exists(relaysfile):
             self.relayinfo = load_relayinfo(relaysfile)
+        if hasattr(self, 'tree'):
+            self.rebuild_packets_table()
 
 
 
@@ -1148,6 +4113,13 @@ class LogAnalyzerGUI:
         self.update_status(f"Автоскролл {status}")
 
 
+    def update_retention(self):
+        """Применяет ограничение числа хранимых пакетов"""
+        self.parser.max_packets = self.max_packets.get() or None
+        if not self.file_loader:
+            self.parser.enforce_retention()
+            self.update_statistics()
+
     def toggle_filterwebserver(self):
         self.parser.filter_webserver = self.filter_webserver.get() 
 
@@ -1159,6 +4131,8 @@ class LogAnalyzerGUI:
     def toggle_writelog(self):
         if self.serial_reader:
             self.serial_reader.to_file = self.writelog.get() 
+        if self.ingest_engine:
+            self.ingest_engine.to_file = self.writelog.get()
 
 
     def toggle_rawline(self):
@@ -1171,6 +4145,9 @@ class LogAnalyzerGUI:
 
     def reconnect_serial(self):
         """Переподключает сериал порт"""
+        if not self.serial_reader:
+            self.update_status("Последовательный порт не выбран")
+            return
         if self.serial_running:
             self.serial_reader.stop()
             self.serial_running = False
@@ -1204,9 +4181,15 @@ class LogAnalyzerGUI:
         packets_frame = ttk.LabelFrame(main_frame, text="Пакеты", padding="10")
         packets_frame.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
 
+        self.create_filter_bar(packets_frame)
+
         # Создание Treeview
+        # Таблица виртуальная: в Treeview только видимые строки, содержимое берется
+        # из упорядоченного списка ID пакетов при прокрутке
         columns = ('ID', 'От', 'Кому', 'Тип','Первый', 'Ретрансляция', 'Задержка(с)', 'Дубли', 'relays', 'Событий')
-        self.tree = ttk.Treeview(packets_frame, columns=columns, show='headings', height=15)
+        table_height = 15
+        self.tree = ttk.Treeview(packets_frame, columns=columns, show='headings', height=table_height,
+                                 selectmode='browse')
 
         # Настройка колонок
         col_widths = [40, 80, 80, 60, 40, 60, 60, 80, 80, 40]
@@ -1214,16 +4197,27 @@ class LogAnalyzerGUI:
             self.tree.heading(col, text=col)
             self.tree.column(col, width=width, anchor=tk.CENTER)
 
-        # Скроллбар для таблицы
-        tree_scroll = ttk.Scrollbar(packets_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=tree_scroll.set)
+        # Скроллбар для таблицы прокручивает список пакетов, а не строки Treeview
+        self.tree_scroll = ttk.Scrollbar(packets_frame, orient=tk.VERTICAL, command=self.on_table_scroll)
+        self.table = PacketTable(self.tree, self.tree_scroll, self.filter_label, self.packet_row_values,
+                                 table_height)
 
-        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        tree_scroll.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.tree_scroll.grid(row=1, column=1, sticky=(tk.N, tk.S))
+
+        self.tree.bind('<MouseWheel>', self.on_table_wheel)
+        self.tree.bind('<Button-4>', lambda e: self.scroll_table(-3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll_table(3))
+        self.tree.bind('<Up>', lambda e: self.move_table_selection(-1))
+        self.tree.bind('<Down>', lambda e: self.move_table_selection(1))
+        self.tree.bind('<Prior>', lambda e: self.move_table_selection(-self.table.height))
+        self.tree.bind('<Next>', lambda e: self.move_table_selection(self.table.height))
+        self.tree.bind('<Home>', lambda e: self.move_table_selection(-len(self.table.ids)))
+        self.tree.bind('<End>', lambda e: self.move_table_selection(len(self.table.ids)))
 
         # Конфигурация расширения для таблицы
         packets_frame.columnconfigure(0, weight=1)
-        packets_frame.rowconfigure(0, weight=1)
+        packets_frame.rowconfigure(1, weight=1)
 
         # Детали пакета
         details_frame = ttk.LabelFrame(main_frame, text="Детали пакета", padding="10")
@@ -1246,6 +4240,102 @@ class LogAnalyzerGUI:
         # Привязка события выбора в таблице
         self.tree.bind('<<TreeviewSelect>>', self.on_packet_select)
 
+    def create_filter_bar(self, parent):
+        """Строка фильтров над таблицей пакетов"""
+        bar = ttk.Frame(parent)
+        bar.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+        self.filter_vars = {}
+        fields = (('node', "Узел:", 16), ('relay', "Релей:", 8), ('packet_type', "Тип:", 12),
+                  ('event_type', "Событие:", 18), ('time_from', "С:", 9), ('time_to', "По:", 9),
+                  ('text', "Текст:", 24))
+        for key, label, width in fields:
+            ttk.Label(bar, text=label).pack(side=tk.LEFT, padx=(5, 2))
+            var = tk.StringVar()
+            if key in ('packet_type', 'event_type'):
+                entry = ttk.Combobox(bar, textvariable=var, width=width,
+                                     postcommand=lambda key=key: self.fill_filter_values(key))
+                entry.bind('<<ComboboxSelected>>', lambda e: self.apply_filter())
+                self.filter_vars[key + '_box'] = entry
+            else:
+                entry = ttk.Entry(bar, textvariable=var, width=width)
+            entry.bind('<Return>', lambda e: self.apply_filter())
+            entry.pack(side=tk.LEFT)
+            self.filter_vars[key] = var
+        ttk.Button(bar, text="Найти", command=self.apply_filter).pack(side=tk.LEFT, padx=(10, 2))
+        ttk.Button(bar, text="Сброс", command=self.reset_filter).pack(side=tk.LEFT, padx=2)
+        self.filter_label = ttk.Label(bar, text="")
+        self.filter_label.pack(side=tk.LEFT, padx=10)
+
+    def fill_filter_values(self, key):
+        """Значения выпадающих списков - из индексов парсера"""
+        if self.file_loader:
+            return  # Парсер заполняется загрузкой файла
+        index = self.parser.index_type if key == 'packet_type' else self.parser.index_event
+        self.filter_vars[key + '_box']['values'] = [""] + sorted(str(value) for value in index)
+
+    def resolve_nodes(self, text):
+        """
+        ID узлов по тексту фильтра: полный ID (с ! или 0x или без), последние 4 знака ID,
+        как в таблице, или часть длинного/короткого имени из nodeinfo
+        """
+        text = text.strip().lower()
+        if text.startswith('!'):
+            text = text[1:]
+        elif text.startswith('0x'):
+            text = text[2:]
+        if text in self.parser.index_node:
+            return [text]
+        nodes = [node for node in self.parser.index_node if node.endswith(text)]
+        for node_id, info in self.nodeinfo.items():
+            user = info.get('user', {})
+            if text in user.get('longName', '').lower() or text == user.get('shortName', '').lower():
+                nodes.append(node_id.lstrip('!'))
+        return nodes
+
+    def resolve_relays(self, text):
+        """Байты релея по тексту фильтра: сам байт (E6) или имя из relays.txt"""
+        text = text.strip()
+        relays = [relay for relay, name in self.relayinfo.items() if text.lower() in name.lower()]
+        return relays + [text.upper()]
+
+    def apply_filter(self):
+        """Показывает в таблице только пакеты, подходящие под фильтры"""
+        values = {key: var.get().strip() for key, var in self.filter_vars.items()
+                  if not key.endswith('_box')}
+        table_filter = {}
+        if values['node']:
+            table_filter['node'] = self.resolve_nodes(values['node'])
+        if values['relay']:
+            table_filter['relay'] = self.resolve_relays(values['relay'])
+        if values['packet_type']:
+            # Известные типы - имена, неизвестные portnum - числа
+            packet_type = values['packet_type']
+            table_filter['packet_type'] = [packet_type, int(packet_type)] if packet_type.isdigit() else packet_type
+        if values['event_type']:
+            table_filter['event_type'] = values['event_type'].upper()
+        for key in ('time_from', 'time_to'):
+            if values[key]:
+                if time_to_seconds(values[key]) is None:
+                    messagebox.showerror("Ошибка", "Время указывается как ЧЧ:ММ:СС")
+                    return
+                table_filter[key] = values[key]
+        if values['text']:
+            table_filter['text'] = values['text']
+        self.table.filter = table_filter
+        self.rebuild_packets_table()
+
+        # Поиск по тексту - сразу к первому найденному пакету
+        if values['text'] and self.table.ids:
+            self.table.selected_packet_id = None
+            self.table.top = 0
+            self.move_table_selection(0)
+
+    def reset_filter(self):
+        for key, var in self.filter_vars.items():
+            if not key.endswith('_box'):
+                var.set("")
+        self.apply_filter()
+
     def details_show_menu(self,event):
         self.details_context_menu.tk_popup(event.x_root, event.y_root)
 
@@ -1278,26 +4368,72 @@ class LogAnalyzerGUI:
 
     def update_gui(self):
         """Обновляет GUI"""
+        diagnostics = self.diagnostics if self.diagnostics.enabled else None
         if self.serial_running:
+            if diagnostics:
+                tick_start = time.perf_counter()
+                source = self.serial_reader or self.udp_receiver or self.file_follower or self.ingest_engine
+                queue_depth = source.data_queue.qsize() if source else 0
+
             # Читаем новые данные
+            tagged = False
             if hasattr(self, 'serial_reader') and self.serial_reader:
                 lines = self.serial_reader.get_data()
             elif hasattr(self, 'udp_receiver') and self.udp_receiver:
                 lines = self.udp_receiver.get_data()
+                self.update_status(self.udp_receiver.summary())
+            elif self.file_follower:
+                lines = self.file_follower.get_data()
+            elif self.ingest_engine:
+                lines = self.ingest_engine.get_data()
+                tagged = True
+                self.update_status(self.ingest_engine.summary())
             else:
                 lines = []
 
-            for line in lines:
-                self.parser.parse_line(line)
+            if diagnostics:
+                start = time.perf_counter()
+                parsed = self.parse_lines(lines, tagged)
+                diagnostics.add_parse(queue_depth, len(lines), parsed, time.perf_counter() - start)
+            else:
+                self.parse_lines(lines, tagged)
 
             # Обновляем статистику каждые 2 секунды
             self.update_statistics()
+            if diagnostics:
+                diagnostics.add_time('tick', time.perf_counter() - tick_start)
 
         # Планируем следующее обновление
         self.root.after(2000, self.update_gui)
 
+    def parse_lines(self, lines, tagged=False):
+        """
+        Разбирает строки источника, возвращает число событий. tagged - строки парами
+        (источник, строка) от IngestEngine: событие запоминает свой источник
+        """
+        parse_line = self.parser.parse_line
+        parsed = 0
+        if tagged:
+            for source, line in lines:
+                event = parse_line(line)
+                if event is not None:
+                    event.source = source
+                    parsed += 1
+        else:
+            for line in lines:
+                if parse_line(line) is not None:
+                    parsed += 1
+        return parsed
+
     def update_statistics(self):
         """Обновляет статистику в статус баре"""
+        # Парсер заполняется фоновым потоком - обновим по окончании загрузки
+        if self.file_loader:
+            return
+
+        diagnostics = self.diagnostics if self.diagnostics.enabled else None
+        if diagnostics:
+            start = time.perf_counter()
         stats = self.parser.get_statistics()
         
         # Обновляем метки в статус баре
@@ -1308,104 +4444,73 @@ class LogAnalyzerGUI:
         self.stats_labels['nodes'].config(text=f"📡 Узлы: {stats['unique_nodes']}")
         self.stats_labels['busy'].config(text=f"⚠️ BusyRx: {stats['busy_rx_count']}")
         self.stats_labels['delay'].config(text=f"⏱️ Задержка: {stats['avg_retransmission_delay']:.1f}с")
+        self.stats_labels['evicted'].config(text=f"🗑 Вытеснено: {stats['evicted_packets']}")
+        channel = self.parser.metrics.get_channel_metrics().get('1m')
+        if channel:
+            self.stats_labels['channel'].config(
+                text=f"📶 Канал 1м: RX {channel['rx_per_min']:.0f}/мин, TX {channel['tx_per_min']:.0f}/мин, "
+                     f"BusyRx {channel['busy_rx_per_min']:.0f}/мин, эфир {channel['channel_utilization']:.0f}%")
 
 
         # Обновляем таблицу пакетов
+        if diagnostics:
+            diagnostics.add_time('update_statistics', time.perf_counter() - start)
+            start = time.perf_counter()
         self.update_packets_table()
+        if diagnostics:
+            diagnostics.add_time('update_packets_table', time.perf_counter() - start)
 
-    def update_packets_table(self):
-        """Обновляет таблицу пакетов"""
+    def packet_row_values(self, summary):
+        """Значения колонок таблицы для сводки пакета"""
+        return format_packet_row(summary, self.node_names, self.relayinfo)
 
-        focus_on_tree = False
-        try:
-            focus_on_tree = (self.root.focus_get() == self.tree)
-        except (Exception) as e:
-            pass
-        # Сохраняем ID текущего выделенного пакета
-        current_selection = self.tree.selection()
-        selected_packet_id = None
-        item_to_select = None
-    
-        if current_selection:
-            selected_item = current_selection[0]
-            item_values = self.tree.item(selected_item, 'values')
-            if item_values:
-                selected_packet_id = item_values[0]  # Первая колонка = ID пакета
-
-        # Очищаем таблицу
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        # Добавляем данные
-        summaries = self.parser.get_all_packet_summaries()
-        packet_id_display= None
-        item_id = None
-        for summary in summaries:
-            delay_str = f"{summary['delay_seconds']:.0f}" if summary['delay_seconds']!=None else "N/A"
-            packet_id_display = f"0x{summary['packet_id']}"
-
-            from_node = self.get_display_name(summary['from_node'])
-            to_node = self.get_display_name(summary['to_node'])
-
-            rs = summary['relays']
-            relays = [self.relayinfo.get(x, x) for x in rs]
-            packet_type = summary['packet_type']
-
-            item_id = self.tree.insert('', 'end', values=(
-                packet_id_display,
-                #summary['message'],
-                from_node,
-                to_node,
-                packet_type,
-                summary['first_received'] or 'N/A',
-                summary['retransmission_time'] or 'N/A',
-                delay_str,
-                summary['duplicate_count'],
-                relays,
-                summary['event_count']
-            ))
-
-            # Если это искомый пакет - запоминаем для выделения
-            if packet_id_display == selected_packet_id:
-                item_to_select = item_id
-
-        # Выделяем нужный элемент
-        if item_to_select:
-            self.tree.unbind('<<TreeviewSelect>>')
-            self.tree.selection_set(item_to_select)
-            self.root.after(10, lambda: self.tree.bind('<<TreeviewSelect>>', self.on_packet_select))
-            #
-            #self.tree.see(item_to_select)    
-            if focus_on_tree:
-                self.tree.focus(item_to_select)                
-                #self.tree.focus_set()            
-
-
-            # Автоскролл в конец
-        if self.autoscroll.get():    
-            if self.tree.get_children():
-                last_item = self.tree.get_children()[-1]
-                self.tree.see(last_item)
-                   
+    def scroll_table(self, rows):
+        self.table.scroll_by(rows)
+        return "break"
+
+    def on_table_scroll(self, *args):
+        """Команда скроллбара: moveto доля / scroll n units|pages"""
+        self.table.scroll_command(*args)
 
+    def on_table_wheel(self, event):
+        # Windows - шаг 120, macOS - единицы
+        step = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self.scroll_table(-3 * step)
+
+    def move_table_selection(self, rows):
+        """Перемещает выделение по списку пакетов, прокручивая таблицу"""
+        packet_id = self.table.move_selection(rows)
+        if packet_id is not None:
+            self.show_packet_details(packet_id)
+        return "break"
+
+    def update_packets_table(self):
+        """Обновляет в таблице только пакеты, изменившиеся с прошлого обновления"""
+        self.table.update(self.parser, self.autoscroll.get())
+
+    def rebuild_packets_table(self):
+        """Полностью перестраивает таблицу пакетов (смена парсера, режима имен, nodeinfo)"""
+        if self.file_loader:
+            # Перестроим после окончания загрузки файла
+            self.table.parser = None
+            return
+        self.table.rebuild(self.parser, self.autoscroll.get())
 
     def on_packet_select(self, event):
         """Обрабатывает выбор пакета в таблице"""
         selection = self.tree.selection()
         if not selection:
             return
-
-        item = self.tree.item(selection[0])
-        packet_id_hex = item['values'][0]
-        packet_id = packet_id_hex[2:] if packet_id_hex.startswith('0x') else packet_id_hex
-
-        # Показываем детали пакета
-        self.show_packet_details(packet_id)
+        # Выделение, восстановленное при прокрутке, детали не перерисовывает
+        packet_id = self.table.select_item(selection[0])
+        if packet_id is not None:
+            self.show_packet_details(packet_id)
 
     def show_packet_details(self, packet_id):
         self.current_packet_details_id = packet_id
         """Показывает детали выбранного пакета"""
         events = self.parser.messages.get(packet_id, [])
+        search = self.table.filter.get('text', '').lower()
 
         details = f"Детали пакета 0x{packet_id}:\n"
         details += "="*80 + "\n\n"
@@ -1427,7 +4532,10 @@ class LogAnalyzerGUI:
             relay += self.relayinfo.get( event['relay_node'],"" )
             msg = event['message'] or 'N/A'
 
-            details += f"{timestamp} - {event_type}\n" 
+            details += f"{timestamp} - {event_type}"
+            if 'source' in event:
+                details += f"  [{event['source']}]"
+            details += "\n"
             if event_type == "RX":                
                 details += f"  От: {from_node} Кому: {to_node}\n"   #Сообщение: {msg}
                 if event['rx_snr'] is not None:
@@ -1448,22 +4556,181 @@ class LogAnalyzerGUI:
                 if 'route_back' in event:
                     details += f'  route_back: {self.decrypt_route_string(event["route_back"])}\n'
 
-            if self.rawline.get():
+            # Строки с искомым текстом показываются всегда
+            if self.rawline.get() or (search and search in event['raw_line'].lower()):
                 details += f"  raw: { event['raw_line']}\n"
             details += "\n"
             
 
         self.details_text.delete(1.0, tk.END)
         self.details_text.insert(1.0, details)
+        if search:
+            self.highlight_details(search)
+
+    def highlight_details(self, text):
+        """Подсвечивает в деталях пакета найденный текст"""
+        self.details_text.tag_configure('found', background='yellow')
+        start = '1.0'
+        while True:
+            start = self.details_text.search(text, start, stopindex=tk.END, nocase=True)
+            if not start:
+                break
+            end = f"{start}+{len(text)}c"
+            self.details_text.tag_add('found', start, end)
+            start = end
+
+    def show_metrics_window(self):
+        """Окно с метриками приема по отправителям и ретрансляторам"""
+        if self.metrics_window and self.metrics_window.winfo_exists():
+            self.metrics_window.lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Метрики узлов, релеев и канала")
+        window.geometry("1100x500")
+        self.metrics_window = window
+
+        notebook = ttk.Notebook(window)
+        notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        columns = (('name', 'Узел', 220), ('packets', 'Пакетов', 70), ('rx_count', 'Приемов', 70),
+                   ('rate', 'Пакетов/ч', 80), ('dup', 'Дубли %', 70),
+                   ('snr', 'SNR ср (мин..макс) p50/p90', 220), ('rssi', 'RSSI ср (мин..макс) p50/p90', 220),
+                   ('hops', 'Хопы', 200))
+        channel_columns = (('window', 'Окно', 80), ('rx_per_min', 'RX/мин', 90), ('tx_per_min', 'TX/мин', 90),
+                           ('busy_rx_per_min', 'BusyRx/мин', 90),
+                           ('retransmissions_per_min', 'Ретрансляций/мин', 120),
+                           ('airtime_seconds', 'Эфир, с', 90), ('channel_utilization', 'Загрузка канала %', 120))
+        frame = ttk.Frame(notebook)
+        notebook.add(frame, text='Канал')
+        channel_tree = ttk.Treeview(frame, columns=[c[0] for c in channel_columns], show='headings')
+        for column, heading, width in channel_columns:
+            channel_tree.heading(column, text=heading)
+            channel_tree.column(column, width=width)
+        channel_tree.pack(fill=tk.BOTH, expand=True)
+
+        trees = {}
+        for key, title in (('node', 'Отправители'), ('relay', 'Ретрансляторы')):
+            frame = ttk.Frame(notebook)
+            notebook.add(frame, text=title)
+            tree = ttk.Treeview(frame, columns=[c[0] for c in columns], show='headings')
+            for column, heading, width in columns:
+                tree.heading(column, text=heading)
+                tree.column(column, width=width)
+            scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+            tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            trees[key] = tree
+
+        def sketch(summary):
+            if summary['avg'] is None:
+                return ""
+            return f"{summary['avg']} ({summary['min']}..{summary['max']}) {summary['p50']}/{summary['p90']}"
+
+        def refresh():
+            if not window.winfo_exists():
+                return
+            channel_tree.delete(*channel_tree.get_children())
+            for name, m in self.parser.metrics.get_channel_metrics().items():
+                channel_tree.insert('', tk.END, values=[name] + [m[c[0]] for c in channel_columns[1:]])
+            tables = (('node', self.parser.metrics.get_node_metrics(), self.get_display_name),
+                      ('relay', self.parser.metrics.get_relay_metrics(),
+                       lambda relay: self.relayinfo.get(relay, relay)))
+            for key, metrics, name in tables:
+                tree = trees[key]
+                tree.delete(*tree.get_children())
+                for node, m in sorted(metrics.items(), key=lambda item: -item[1]['rx_count']):
+                    tree.insert('', tk.END, values=(
+                        name(node), m['packets'], m['rx_count'],
+                        m['packets_per_hour'] if m['packets_per_hour'] is not None else "",
+                        f"{m['duplicate_ratio'] * 100:.0f}" if m['duplicate_ratio'] is not None else "",
+                        sketch(m['snr']), sketch(m['rssi']),
+                        " ".join(f"{hops}:{n}" for hops, n in m['hops'].items())))
+            window.after(2000, refresh)
+
+        refresh()
+
+    def show_diagnostics_window(self):
+        """Окно замеров конвейера: источник -> очередь -> разбор -> обновление GUI"""
+        if self.diagnostics_window and self.diagnostics_window.winfo_exists():
+            self.diagnostics_window.lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Диагностика конвейера")
+        window.geometry("800x360")
+        self.diagnostics_window = window
+        # Замеры включаются с открытием окна
+        self.diagnostics.enabled = True
+
+        enabled = tk.BooleanVar(value=True)
+
+        def toggle():
+            self.diagnostics.enabled = enabled.get()
+
+        def save():
+            filename = f"diagnostics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            try:
+                with open(filename, 'w', encoding='utf-8') as f:
+                    json.dump(self.diagnostics.dump(), f, indent=2, ensure_ascii=False)
+                messagebox.showinfo("Диагностика", f"Замеры сохранены в {filename}", parent=window)
+            except Exception as e:
+                messagebox.showerror("Ошибка", f"Ошибка сохранения: {e}", parent=window)
+
+        def reset():
+            self.diagnostics.reset()
+            refresh()
+
+        bar = ttk.Frame(window)
+        bar.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Checkbutton(bar, text="Замерять", variable=enabled, command=toggle).pack(side=tk.LEFT)
+        ttk.Button(bar, text="Сброс", command=reset).pack(side=tk.LEFT, padx=5)
+        ttk.Button(bar, text="Сохранить JSON", command=save).pack(side=tk.LEFT)
+        summary_label = ttk.Label(window, text="", justify=tk.LEFT)
+        summary_label.pack(fill=tk.X, padx=5)
+
+        columns = (('name', 'Замер', 240), ('count', 'Тиков', 70), ('min', 'Мин', 80), ('avg', 'Среднее', 80),
+                   ('p50', 'p50', 80), ('p90', 'p90', 80), ('max', 'Макс', 80))
+        tree = ttk.Treeview(window, columns=[c[0] for c in columns], show='headings')
+        for column, heading, width in columns:
+            tree.heading(column, text=heading)
+            tree.column(column, width=width)
+        tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        titles = {
+            'queue_depth': "Очередь источника, элементов",
+            'tick_lines': "Строк за тик",
+            'parse_ms': "Разбор за тик, мс",
+            'parse_line_us': "parse_line на строку, мкс",
+            'update_statistics_ms': "update_statistics, мс",
+            'update_packets_table_ms': "update_packets_table, мс",
+            'tick_ms': "Тик целиком, мс",
+        }
+
+        def number(value):
+            return "" if value is None else f"{value:.1f}"
+
+        def refresh():
+            if not window.winfo_exists():
+                # Окно закрыто - замеры больше не нужны
+                self.diagnostics.enabled = False
+                return
+            data = self.diagnostics.dump()
+            summary_label.config(
+                text=f"Тиков: {data['ticks']}, строк получено: {data['lines_ingested']} "
+                     f"({data['ingested_per_sec']:.0f}/с), разобрано в события: {data['lines_parsed']} "
+                     f"({data['parsed_per_sec']:.0f}/с), в очереди: {data['queue_depth']}" +
+                     (f"\nЗапуск: окно через {data['startup']['window_seconds']}с" if data['startup'] else ""))
+            tree.delete(*tree.get_children())
+            for name, histogram in self.diagnostics.histograms.items():
+                summary = data['histograms'][name]
+                tree.insert('', tk.END, values=(titles[name], histogram.count) +
+                            tuple(number(summary[key]) for key in ('min', 'avg', 'p50', 'p90', 'max')))
+            window.after(1000, refresh)
+
+        refresh()
 
     def export_json(self):
         """Экспортирует данные в JSON файл"""
         try:
-            data = {
-                'statistics': self.parser.get_statistics(),
-                'packets': self.parser.get_all_packet_summaries(),
-                'nodes': list(self.parser.nodes)
-            }
+            data = self.parser.get_export_data()
 
             filename = f"mesh_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
             with open(filename, 'w', encoding='utf-8') as f:
@@ -1475,9 +4742,9 @@ class LogAnalyzerGUI:
 
     def clear_data(self):
         """Очищает все данные"""
-        save_ts = self.parser.time_correction
-        self.parser = LogParser()
-        self.parser.time_correction = save_ts
+        self.cancel_file_loading()
+        self.file_loader = None
+        self.parser = self.new_parser()
         
         self.update_statistics()
         self.details_text.delete(1.0, tk.END)
@@ -1501,7 +4768,7 @@ class ConnectionDialog:
     def show(self):
         dialog = tk.Toplevel(self.parent)
         dialog.title("Выберите источник данных")
-        dialog.geometry("400x300")
+        dialog.geometry("400x380")
         dialog.transient(self.parent)
         #dialog.grab_set()
         
@@ -1526,6 +4793,16 @@ class ConnectionDialog:
         ttk.Button(btn_frame, text="📁 Загрузить из файла лога",
                   command=lambda: self.select_file(dialog),
                   width=30).pack(pady=5)
+
+        # Кнопка слежения за дописываемым файлом
+        ttk.Button(btn_frame, text="👁 Следить за файлом лога",
+                  command=lambda: self.select_follow(dialog),
+                  width=30).pack(pady=5)
+
+        # Кнопка приема из нескольких источников
+        ttk.Button(btn_frame, text="🛰 Несколько источников",
+                  command=lambda: self.select_multi(dialog),
+                  width=30).pack(pady=5)
         
         # Кнопка отмены
         ttk.Button(btn_frame, text="❌ Отмена",
@@ -1606,16 +4883,484 @@ class ConnectionDialog:
             self.result = ('file', filename)
             dialog.destroy()
     
+    def select_follow(self, dialog):
+        filename = filedialog.askopenfilename(
+            title="Выберите файл лога для слежения",
+            initialdir=log_writer.directory,
+            filetypes=[("Text files", "*.txt *.log"), ("All files", "*.*")]
+        )
+        if filename:
+            self.result = ('follow', filename)
+            dialog.destroy()
+
+    def select_multi(self, dialog):
+        # Диалог для ввода списка источников
+        sources_dialog = tk.Toplevel(dialog)
+        sources_dialog.title("Несколько источников")
+        sources_dialog.geometry("450x170")
+        sources_dialog.grab_set()
+
+        ttk.Label(sources_dialog, text="Источники через запятую:\n"
+                  "udp:1514, serial:/dev/ttyUSB0, file:logs/20250101.log").pack(pady=10)
+
+        spec_var = tk.StringVar(value="udp:1514")
+        spec_entry = ttk.Entry(sources_dialog, textvariable=spec_var, width=60)
+        spec_entry.pack(pady=5, padx=10)
+
+        def on_connect():
+            try:
+                self.result = ('multi', parse_source_spec(spec_var.get()))
+            except ValueError as e:
+                messagebox.showerror("Ошибка", str(e))
+                return
+            sources_dialog.destroy()
+            dialog.destroy()
+
+        ttk.Button(sources_dialog, text="Подключиться", command=on_connect).pack(pady=10)
+        spec_entry.bind('<Return>', lambda e: on_connect())
+
     def cancel(self, dialog):
         self.result = None
         dialog.destroy()
 
 
+CSV_COLUMNS = ('packet_id', 'from_node', 'to_node', 'packet_type', 'message', 'first_received',
+               'retransmission_time', 'delay_seconds', 'duplicate_count', 'event_count',
+               'received_count', 'relays')
+
+
+def parse_log_files(parser, filenames, use_index=False):
+    """
+    Прогоняет файлы логов ('-' - stdin) через парсер, возвращает число строк.
+    use_index - брать уже разобранное из кэша (load_log_index) и обновлять его
+    """
+    lines_count = 0
+    for filename in filenames:
+        if use_index and filename != '-':
+            loader = FileLoader(filename, parser, use_index=True)
+            loader.load()
+            lines_count += loader.lines_read
+            continue
+        if filename == '-':
+            f = open(sys.stdin.fileno(), 'r', encoding='utf-8', errors='ignore', closefd=False)
+        else:
+            f = open(filename, 'r', encoding='utf-8', errors='ignore')
+        with f, gc_paused():
+            for line in f:
+                parser.parse_line(line.strip())
+                lines_count += 1
+    return lines_count
+
+
+def write_csv(summaries, output):
+    """Пишет сводки пакетов в CSV"""
+    writer = csv.writer(output)
+    writer.writerow(CSV_COLUMNS)
+    for summary in summaries:
+        row = [summary[column] for column in CSV_COLUMNS]
+        row[-1] = ' '.join(summary['relays'])
+        writer.writerow(row)
+
+
+def run_cli(args):
+    """Пакетный анализ логов без GUI"""
+    parser = LogParser()
+    parser.time_correction = not args.no_time_correction
+    parser.filter_webserver = not args.keep_webserver
+    parser.legacy_parser = args.legacy_parser
+    # Метрики нужны только JSON экспорту и только по запросу - без них разбор быстрее
+    parser.collect_metrics = args.metrics and args.format == 'json'
+    parser.max_packets = args.max_packets
+    parser.max_age = args.max_age
+    if args.max_memory is not None:
+        parser.max_memory = args.max_memory * 1024 * 1024
+
+    start = time.perf_counter()
+    if args.jobs > 1:
+        lines_count = parse_files_parallel(parser, args.files, args.jobs)
+    else:
+        lines_count = parse_log_files(parser, args.files, args.index)
+    elapsed = time.perf_counter() - start
+
+    data = parser.get_export_data()
+    data['throughput'] = {
+        'lines': lines_count,
+        'seconds': elapsed,
+        'lines_per_sec': lines_count / elapsed if elapsed > 0 else 0
+    }
+
+    if args.output:
+        output = open(args.output, 'w', encoding='utf-8', newline='')
+    else:
+        output = open(sys.stdout.fileno(), 'w', encoding='utf-8', newline='', closefd=False)
+    with output:
+        if args.format == 'csv':
+            write_csv(data['packets'], output)
+        else:
+            json.dump(data, output, indent=2, ensure_ascii=False)
+            output.write('\n')
+
+    print(f"Обработано строк: {lines_count} за {elapsed:.2f}с "
+          f"({data['throughput']['lines_per_sec']:.0f} строк/с), пакетов: {len(data['packets'])}",
+          file=sys.stderr)
+    return 0
+
+
+# Порты синтетических пакетов, с примерно реальными частотами
+GENERATED_PORTNUMS = (3, 3, 3, 4, 4, 67, 67, 67, 1, 70, 71, 5)
+
+
+def generated_node_ids(nodes, seed=1):
+    """ID узлов синтетического лога, те же, что у generate_log с тем же seed"""
+    rng = random.Random(seed)
+    return [f"{rng.getrandbits(32):08x}" for _ in range(nodes)]
+
+
+def generated_nodeinfo(nodes, seed=1):
+    """nodeinfo.json для узлов синтетического лога"""
+    return {f"!{node_id}": {"user": {"longName": f"Node {node_id[-4:].upper()}", "shortName": node_id[-4:]}}
+            for node_id in generated_node_ids(nodes, seed)}
+
+
+def generate_log(packets, duplicates=0.3, nodes=40, seed=1, start='10:00:00'):
+    """
+    Синтетический лог прошивки для замеров: Lora RX с релеем/SNR/RSSI, постановка в очередь,
+    передача, traceroute с маршрутами, шум WebServer. Доля duplicates пакетов принимается
+    повторно через другой релей. Одинаковые параметры - одинаковый лог
+    """
+    node_ids = generated_node_ids(nodes, seed)
+    rng = random.Random(seed)
+    seconds = time_to_seconds(start)
+    uptime = rng.randint(1000, 100000)
+    for _ in range(packets):
+        step = rng.randint(0, 3)
+        seconds += step
+        uptime += step
+        timestamp = f"{seconds // 3600 % 24:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+        info = f"INFO  | {timestamp} {uptime} "
+        debug = f"DEBUG | {timestamp} {uptime} "
+        packet_id = f"{rng.getrandbits(32):x}"
+        from_node = rng.choice(node_ids)
+        portnum = rng.choice(GENERATED_PORTNUMS)
+        hop_start = rng.choice((3, 3, 3, 7))
+        hop_lim = rng.randint(0, hop_start)
+        length = rng.randint(10, 230)
+        header = f"id=0x{packet_id} fr=0x{from_node} to=0xffffffff"
+
+        relay = rng.choice(node_ids)[-2:]
+        yield (f"{info}[Router] Lora RX ({header}, transport = 0, WantAck=0, HopLim={hop_lim} Ch=0x8 "
+               f"Portnum={portnum} len={length} rxtime={uptime} hopStart={hop_start} relay=0x{relay} "
+               f"rxSNR={rng.uniform(-20, 10):.2f} rxRSSI={rng.randint(-130, -30)})")
+        if portnum == 1:
+            yield f"{info}[Router] Received text msg from=0x{from_node}, id=0x{packet_id}, msg=Hello {packet_id}"
+        elif portnum == 70:
+            hops = rng.sample(node_ids, 2)
+            yield f"{info}[Router] Received traceroute from=0x{from_node}, id=0x{packet_id}, portnum=70"
+            yield (f"{info}[Router] route: 0x{from_node} --> 0x{hops[0]} ({rng.uniform(-20, 10):.2f}dB) "
+                   f"--> 0x{hops[1]} ({rng.uniform(-20, 10):.2f}dB)")
+            yield f"{info}[Router] route back: 0x{hops[1]} <-- 0x{from_node} ({rng.uniform(-20, 10):.2f}dB)"
+        if rng.random() < 0.5:
+            yield f"{debug}[WebServer] Handling request /json/report"
+        yield f"{debug}[Router] handleReceived(REMOTE) ({header}, HopLim={hop_lim} Portnum={portnum})"
+
+        if hop_lim > 0:
+            # Ретрансляция через 0-2 с после приема
+            delay = rng.randint(0, 2)
+            seconds += delay
+            uptime += delay
+            timestamp = f"{seconds // 3600 % 24:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+            debug = f"DEBUG | {timestamp} {uptime} "
+            tx_header = f"{header}, HopLim={hop_lim - 1} Portnum={portnum} len={length} hopStart={hop_start}"
+            yield f"{debug}[Router] enqueue for send ({tx_header})"
+            if rng.random() < 0.2:
+                yield f"{debug}[RadioIf] Can not send yet, busyRx"
+            yield f"{debug}[RadioIf] Started Tx ({tx_header} relay=0x{node_ids[0][-2:]})"
+            yield f"{debug}[RadioIf] Completed sending ({tx_header})"
+
+        if rng.random() < duplicates:
+            relay = rng.choice(node_ids)[-2:]
+            yield (f"{info}[Router] Lora RX ({header}, transport = 0, WantAck=0, HopLim={max(hop_lim - 1, 0)} "
+                   f"Ch=0x8 Portnum={portnum} len={length} rxtime={uptime} hopStart={hop_start} "
+                   f"relay=0x{relay} rxSNR={rng.uniform(-20, 10):.2f} rxRSSI={rng.randint(-130, -30)})")
+            yield f"{debug}[Router] Ignore dupe incoming msg ({header}, HopLim={max(hop_lim - 1, 0)})"
+
+
+class HeadlessWidget:
+    """Виджет-приемник для замеров без дисплея: принимает вызовы Treeview/Label/Scrollbar"""
+
+    def __init__(self):
+        self.rows = {}
+        self.count = 0
+        self.selected = ()
+
+    def insert(self, parent, index, values=()):
+        self.count += 1
+        item_id = f"I{self.count}"
+        self.rows[item_id] = values
+        return item_id
+
+    def item(self, item_id, values=None):
+        if values is not None:
+            self.rows[item_id] = values
+        return self.rows[item_id]
+
+    def delete(self, *items):
+        for item_id in items:
+            del self.rows[item_id]
+
+    def selection(self):
+        return self.selected
+
+    def selection_set(self, item_id):
+        self.selected = (item_id,)
+
+    def selection_remove(self, *items):
+        self.selected = ()
+
+    def focus(self, item_id=None):
+        pass
+
+    def set(self, *args):
+        pass
+
+    def config(self, **options):
+        pass
+
+
+def benchmark_parser(gui=False, legacy=False):
+    """
+    Парсер с настройками CLI или, gui=True, с настройками живого режима GUI;
+    legacy=True - прежний разбор (re.search на каждое поле) для сравнения
+    """
+    parser = LogParser()
+    parser.time_correction = False
+    parser.legacy_parser = legacy
+    if gui:
+        parser.track_changes = True
+        parser.collect_metrics = True
+        parser.indexed = True
+    return parser
+
+
+def time_parse(lines, gui=False, legacy=False):
+    """Разбор строк целиком, как файла в parse_log_files и FileLoader"""
+    parser = benchmark_parser(gui, legacy)
+    with gc_paused():
+        start = time.perf_counter()
+        for line in lines:
+            parser.parse_line(line)
+        seconds = time.perf_counter() - start
+    return seconds, parser
+
+
+def benchmark_timings(times):
+    """Сводка замеров в мс: min/avg/p50/p90/max"""
+    times = sorted(seconds * 1000 for seconds in times)
+    if not times:
+        return {}
+    return {
+        'min': round(times[0], 3),
+        'avg': round(sum(times) / len(times), 3),
+        'p50': round(times[len(times) // 2], 3),
+        'p90': round(times[int(0.9 * (len(times) - 1))], 3),
+        'max': round(times[-1], 3)
+    }
+
+
+def run_benchmark(args):
+    """Замеры парсера, статистики и обновления таблицы по тикам, без GUI"""
+    import tracemalloc
+    if args.files:
+        lines = []
+        for filename in args.files:
+            with open(filename, 'r', encoding='utf-8', errors='ignore') as f:
+                lines.extend(line.strip() for line in f)
+        nodeinfo = {}
+    else:
+        lines = list(generate_log(args.packets, args.duplicates, args.nodes, args.seed))
+        nodeinfo = generated_nodeinfo(args.nodes, args.seed)
+
+    results = {'lines': len(lines), 'python': sys.version.split()[0], 'parse': {}}
+
+    # Скорость разбора - лучший из прогонов, память - отдельным прогоном под tracemalloc
+    for mode, gui, legacy in (('cli', False, False), ('gui', True, False), ('legacy', False, True)):
+        seconds = min(time_parse(lines, gui, legacy)[0] for _ in range(args.repeat))
+        gc.collect()
+        tracemalloc.start()
+        parser = time_parse(lines, gui, legacy)[1]
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results['parse'][mode] = {
+            'seconds': round(seconds, 3),
+            'lines_per_sec': round(len(lines) / seconds) if seconds else 0,
+            'packets': len(parser.packet_stats),
+            'memory_mb': round(current / 1e6, 1),
+            'peak_memory_mb': round(peak / 1e6, 1)
+        }
+        del parser
+        gc.collect()
+    # Разбор CLI должен быть быстрее прежнего разбора на тех же строках
+    cli_seconds = results['parse']['cli']['seconds']
+    results['speedup_vs_legacy'] = round(results['parse']['legacy']['seconds'] / cli_seconds, 2) if cli_seconds else None
+
+    # get_statistics по полному парсеру
+    parser = time_parse(lines)[1]
+    times = []
+    for _ in range(max(args.repeat, 10)):
+        start = time.perf_counter()
+        parser.get_statistics()
+        times.append(time.perf_counter() - start)
+    results['get_statistics_ms'] = benchmark_timings(times)
+    del parser
+
+    # Живой режим: строки приходят порциями, на каждом тике - разбор и обновление как в update_gui
+    parser = benchmark_parser(gui=True)
+    node_names = NodeNames(nodeinfo)
+    table = PacketTable(HeadlessWidget(), HeadlessWidget(), HeadlessWidget(),
+                        lambda summary: format_packet_row(summary, node_names, {}))
+    parse_times, statistics_times, table_times = [], [], []
+    for start_line in range(0, len(lines), args.tick_lines):
+        start = time.perf_counter()
+        for line in lines[start_line:start_line + args.tick_lines]:
+            parser.parse_line(line)
+        parse_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        parser.get_statistics()
+        parser.metrics.get_channel_metrics()
+        statistics_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        table.update(parser)
+        table_times.append(time.perf_counter() - start)
+    results['tick'] = {
+        'lines': args.tick_lines,
+        'ticks': len(table_times),
+        'parse_ms': benchmark_timings(parse_times),
+        'statistics_ms': benchmark_timings(statistics_times),
+        'update_packets_table_ms': benchmark_timings(table_times),
+        'table_rows': len(table.ids)
+    }
+
+    if args.output:
+        output = open(args.output, 'w', encoding='utf-8')
+    else:
+        output = open(sys.stdout.fileno(), 'w', encoding='utf-8', closefd=False)
+    with output:
+        json.dump(results, output, indent=2, ensure_ascii=False)
+        output.write('\n')
+
+    for mode, parse in results['parse'].items():
+        print(f"Разбор ({mode}): {parse['lines_per_sec']} строк/с, пакетов {parse['packets']}, "
+              f"память {parse['memory_mb']} МБ (пик {parse['peak_memory_mb']} МБ)", file=sys.stderr)
+    print(f"get_statistics: {results['get_statistics_ms'].get('avg', 'n/a')} мс", file=sys.stderr)
+    tick = results['tick']
+    # Без строк (пустые файлы) тиков нет и сводки замеров пустые
+    table_ms = tick['update_packets_table_ms']
+    print(f"Тик по {tick['lines']} строк ({tick['ticks']} тиков, в таблице {tick['table_rows']} пакетов): "
+          f"разбор {tick['parse_ms'].get('avg', 'n/a')} мс, статистика {tick['statistics_ms'].get('avg', 'n/a')} мс, "
+          f"таблица {table_ms.get('avg', 'n/a')} мс "
+          f"(p90 {table_ms.get('p90', 'n/a')}, макс {table_ms.get('max', 'n/a')})",
+          file=sys.stderr)
+    speedup = results['speedup_vs_legacy']
+    print(f"Разбор CLI быстрее прежнего (legacy) в {speedup if speedup is not None else 'n/a'} раза",
+          file=sys.stderr)
+    if speedup is not None and speedup < 1:
+        print("Ошибка: разбор CLI медленнее прежнего разбора", file=sys.stderr)
+        return 1
+    return 0
+
+
+def run_generate(args):
+    """Пишет синтетический лог в файл или stdout"""
+    if args.output:
+        output = open(args.output, 'w', encoding='utf-8')
+    else:
+        output = open(sys.stdout.fileno(), 'w', encoding='utf-8', closefd=False)
+    with output:
+        for line in generate_log(args.packets, args.duplicates, args.nodes, args.seed):
+            output.write(line + '\n')
+    if args.nodeinfo:
+        with open(args.nodeinfo, 'w', encoding='utf-8') as f:
+            json.dump(generated_nodeinfo(args.nodes, args.seed), f, ensure_ascii=False, indent=2)
+    return 0
+
+
+def positive_int(value):
+    """Тип аргумента argparse: целое число не меньше 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"нужно целое число не меньше 1, получено {value}")
+    return number
+
+
+def parse_args(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description="Meshtastic Node Log Analyzer. Без аргументов запускается GUI, "
+                    "с файлами логов - пакетный анализ без GUI")
+    arg_parser.add_argument('files', nargs='*', help="файлы логов, '-' - stdin")
+    arg_parser.add_argument('-f', '--format', choices=('json', 'csv'), default='json',
+                            help="формат вывода: json (статистика, пакеты, узлы) или csv (пакеты)")
+    arg_parser.add_argument('-o', '--output', help="файл для вывода (по умолчанию stdout)")
+    arg_parser.add_argument('--no-time-correction', action='store_true',
+                            help="не переводить время UTC в местное")
+    arg_parser.add_argument('--keep-webserver', action='store_true',
+                            help="не отфильтровывать строки WebServer/ServerAPI")
+    arg_parser.add_argument('--metrics', action='store_true',
+                            help="добавить в JSON метрики узлов, релеев и канала (разбор медленнее)")
+    arg_parser.add_argument('--legacy-parser', action='store_true',
+                            help="прежний разбор полей (re.search на каждое поле) - для сравнения результатов")
+    arg_parser.add_argument('--index', action='store_true',
+                            help="использовать и обновлять кэш разобранных логов")
+    arg_parser.add_argument('-j', '--jobs', type=int, default=1,
+                            help="разбирать файлы в N процессах")
+    arg_parser.add_argument('--max-packets', type=int,
+                            help="хранить не больше N последних пакетов")
+    arg_parser.add_argument('--max-age', type=float,
+                            help="вытеснять пакеты старше N секунд (по времени лога)")
+    arg_parser.add_argument('--max-memory', type=float,
+                            help="ограничение памяти под события, МБ (оценка)")
+
+    bench = arg_parser.add_argument_group("замеры производительности")
+    bench.add_argument('--benchmark', action='store_true',
+                       help="замерить разбор, статистику и обновление таблицы без GUI "
+                            "(на синтетическом логе или на указанных файлах), результат - JSON")
+    bench.add_argument('--generate', action='store_true',
+                       help="вывести синтетический лог прошивки")
+    bench.add_argument('--packets', type=positive_int, default=10000,
+                       help="пакетов в синтетическом логе (по умолчанию 10000)")
+    bench.add_argument('--duplicates', type=float, default=0.3,
+                       help="доля пакетов, принятых повторно через другой релей (по умолчанию 0.3)")
+    bench.add_argument('--nodes', type=int, default=40,
+                       help="узлов в синтетическом логе (по умолчанию 40)")
+    bench.add_argument('--seed', type=int, default=1,
+                       help="зерно генератора, одинаковое зерно - одинаковый лог")
+    bench.add_argument('--nodeinfo', help="вместе с --generate записать nodeinfo для узлов лога")
+    bench.add_argument('--repeat', type=positive_int, default=3,
+                       help="прогонов разбора, берется лучший (по умолчанию 3)")
+    bench.add_argument('--tick-lines', type=positive_int, default=500,
+                       help="строк на тик обновления GUI (по умолчанию 500)")
+    return arg_parser.parse_args(argv)
+
+
 # Запуск приложения
 if __name__ == "__main__":
+    args = parse_args()
+    if args.generate:
+        sys.exit(run_generate(args))
+    if args.benchmark:
+        sys.exit(run_benchmark(args))
+    if args.jobs > 1 and '-' in args.files:
+        sys.exit("Параллельный разбор (--jobs) работает только с файлами, не со stdin")
+    if args.jobs > 1 and args.index:
+        sys.exit("Кэш разобранных логов (--index) не работает с параллельным разбором (--jobs)")
+    if args.files:
+        sys.exit(run_cli(args))
+
     if not os.path.exists('logs'):
        os.makedirs('logs')
 
     app = LogAnalyzerGUI()
     if hasattr(app, 'connection_established') and app.connection_established:
-        app.run()
\ No newline at end of file
+        app.run()
+    log_writer.close()
\ No newline at end of file